@@ -0,0 +1,48 @@
+'''
+Benchmark of the construction of MortalityTable and CommutationFunctions, for the usual tables (w=120) and for
+extended tables, like the ones used for fractional-age grids (w up to 10,000).
+
+Run from the root of the repository:
+    python benchmarks/bench_construction.py
+'''
+
+__author__ = "PedroCR"
+
+import os
+import sys
+import timeit
+
+import numpy as np
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+from lifeactuary.mortality_table import MortalityTable
+from lifeactuary.commutation_table import CommutationFunctions
+
+
+def synthetic_table(w):
+    '''
+    Builds a qx table, in the format used by MortalityTable, with w ages following a Gompertz law. The force of
+    mortality is rescaled by 120/w, so that the extended tables mimic a fractional-age grid over a 120 years life span.
+
+    :param w: the number of ages in the table
+    :return: list with the first age followed by the qx values
+    '''
+    qx = 1 - np.exp(-5e-5 * np.exp(np.arange(w) * 10. / w) * 120. / w)
+    return [0] + list(qx)
+
+
+def bench(w, repeat=5):
+    mt = synthetic_table(w)
+    number = max(1, 1000 // w)
+    t_mt = min(timeit.repeat(lambda: MortalityTable(mt=mt), number=number, repeat=repeat)) / number
+    t_cf = min(timeit.repeat(lambda: CommutationFunctions(i=2, mt=mt), number=number, repeat=repeat)) / number
+    return t_mt, t_cf
+
+
+if __name__ == '__main__':
+    print(f"{'w':>8} {'MortalityTable (ms)':>20} {'CommutationFunctions (ms)':>26}")
+    for w in (120, 1000, 10000):
+        t_mt, t_cf = bench(w, repeat=3 if w > 1000 else 5)
+        print(f"{w:>8} {t_mt * 1000:>20.3f} {t_cf * 1000:>26.3f}")
@@ -0,0 +1,66 @@
+'''
+Benchmark of the projection of prospective reserves for a portfolio of 1,000,000 policies over 40 years, with
+ReserveProjection, against the per policy and per duration calls of the scalar functions (timed on a sample and
+extrapolated).
+
+Run from the root of the repository:
+    python benchmarks/bench_reserves.py
+'''
+
+__author__ = "PedroCR"
+
+import os
+import sys
+import time
+
+import numpy as np
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+from lifeactuary.commutation_table import CommutationFunctions
+from lifeactuary.reserves import ReserveProjection
+from lifeactuary.read_soa_table_xml import SoaTable
+
+
+def synthetic_portfolio(size, years=40, seed=0):
+    '''
+    Builds a portfolio of endowment and term insurances, all with a term of years.
+    '''
+    rng = np.random.default_rng(seed)
+    return {'age': rng.integers(20, 60, size),
+            'product': np.where(rng.random(size) < .5, 'endowment_insurance', 'term_insurance'),
+            'term': np.full(size, years),
+            'benefit': rng.integers(1, 100, size) * 1000.}
+
+
+def scalar_reserves(cf, policies, k, years):
+    x, n = policies['age'][k], policies['term'][k]
+    if policies['product'][k] == 'endowment_insurance':
+        premium = cf.nAEx(x, n) / cf.naax(x, n)
+        return [cf.nAEx(x + t, n - t) - premium * cf.naax(x + t, n - t) for t in range(years)]
+    premium = cf.nAx(x, n) / cf.naax(x, n)
+    return [cf.nAx(x + t, n - t) - premium * cf.naax(x + t, n - t) for t in range(years)]
+
+
+if __name__ == '__main__':
+    size, years = 1000000, 40
+    cf = CommutationFunctions(i=2, mt=SoaTable(os.path.join(root, 'soa_tables', 'TV7377.xml')).table_qx, msn_mode='off')
+    policies = synthetic_portfolio(size, years)
+    projection = ReserveProjection(cf)
+
+    start = time.perf_counter()
+    total = projection.total_reserves(policies)
+    t_vectorized = time.perf_counter() - start
+
+    sample = 1000
+    start = time.perf_counter()
+    for k in range(sample):
+        scalar_reserves(cf, policies, k, years)
+    t_scalar = (time.perf_counter() - start) * size / sample
+
+    print(f"{size} policies x {years} years")
+    print(f"{'ReserveProjection (s)':>30} {t_vectorized:>10.2f}")
+    print(f"{'scalar functions, est. (s)':>30} {t_scalar:>10.2f}")
+    print(f"{'speedup':>30} {t_scalar / t_vectorized:>10.1f}")
+    print(f"{'total reserves at t=10':>30} {total[10]:>10.4g}")
@@ -0,0 +1,37 @@
+'''
+Benchmark of the reading of the SOA tables in the folder soa_tables: parsing the xml file against reading the
+binary cache (a header followed by the arrays, that are memory-mapped), written to a temporary folder.
+
+Run from the root of the repository:
+    python benchmarks/bench_soa_tables.py
+'''
+
+__author__ = "PedroCR"
+
+import glob
+import os
+import sys
+import tempfile
+import timeit
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+from lifeactuary.read_soa_table_xml import SoaTable
+
+
+def bench(table_name, cache_dir, number=50, repeat=5):
+    t_xml = min(timeit.repeat(lambda: SoaTable(table_name), number=number, repeat=repeat)) / number
+    SoaTable(table_name, cache=True, cache_dir=cache_dir)  # writes the cache
+    t_cache = min(timeit.repeat(lambda: SoaTable(table_name, cache=True, cache_dir=cache_dir), number=number,
+                                repeat=repeat)) / number
+    return t_xml, t_cache
+
+
+if __name__ == '__main__':
+    folder = os.path.join(root, 'soa_tables')
+    print(f"{'table':>12} {'xml (ms)':>10} {'cache (ms)':>12}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for table_name in sorted(glob.glob(os.path.join(folder, '*.xml'))):
+            t_xml, t_cache = bench(table_name, cache_dir)
+            print(f"{os.path.basename(table_name):>12} {t_xml * 1000:>10.3f} {t_cache * 1000:>12.3f}")
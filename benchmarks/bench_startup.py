@@ -0,0 +1,49 @@
+'''
+Benchmark of the cold start of the package: the time of a new python process that imports each module, against a
+process that only imports numpy, and whether pandas was imported with it (it should only be imported when a
+DataFrame is requested).
+
+Run from the root of the repository:
+    python benchmarks/bench_startup.py
+'''
+
+__author__ = "PedroCR"
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+modules = ('lifeactuary.mortality_table', 'lifeactuary.commutation_table', 'lifeactuary.portfolio',
+           'lifeactuary.scenarios', 'lifeactuary.table_store')
+
+
+def bench(statement, repeat=11):
+    '''
+    Median wall time, in seconds, of a new python process that runs the statement.
+    '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], cwd=root, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def imports_pandas(module):
+    statement = f"import sys, {module}; print('pandas' in sys.modules)"
+    return subprocess.run([sys.executable, '-c', statement], cwd=root, check=True, capture_output=True,
+                          text=True).stdout.strip() == 'True'
+
+
+if __name__ == '__main__':
+    t_numpy = bench('import numpy')
+    print(f"{'module':>32} {'import (ms)':>12} {'over numpy (ms)':>16} {'pandas':>7}")
+    print(f"{'numpy':>32} {t_numpy * 1000:>12.1f} {0:>16.1f} {'':>7}")
+    for module in modules:
+        t = bench(f"import {module}")
+        print(f"{module:>32} {t * 1000:>12.1f} {(t - t_numpy) * 1000:>16.1f} {str(imports_pandas(module)):>7}")
@@ -0,0 +1,237 @@
+'''
+Benchmark suite of the public functions of the package, with the SOA tables in the folder soa_tables, in the style
+of asv: every benchmark has a name and measures one of
+    construction: seconds to build MortalityTable, CommutationFunctions and SoaTable (from the xml), for each table
+    latency: seconds per call of each scalar function of MortalityTable, CommutationFunctions and Annuities_Certain
+    throughput: elements per second of each array function, for batches of batch_size elements
+    peak_memory: bytes allocated at the peak (tracemalloc) of one construction or one batch
+The times are the minimum over the repeats of timeit, and the inputs come from a fixed seed, so runs are comparable.
+The results can be saved as the baseline (benchmarks/baselines.json) and later runs compared with it: the ratios
+current/baseline above the threshold are reported as regressions. The calls of a few microseconds vary by up to about 2
+times between runs on shared machines, so the baseline should be saved on the machine where the suite runs and the
+default threshold is 2.
+
+Run from the root of the repository:
+    python benchmarks/suite.py                      # runs and compares with the baseline, if there is one
+    python benchmarks/suite.py --save               # runs and saves the results as the baseline
+    python benchmarks/suite.py --filter nIAx        # only the benchmarks whose name contains nIAx
+    python benchmarks/suite.py --fail               # exits with 1 if there are regressions (e.g., in CI)
+'''
+
+__author__ = "PedroCR"
+
+import argparse
+import glob
+import inspect
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, root)
+
+from lifeactuary.mortality_table import MortalityTable
+from lifeactuary.commutation_table import CommutationFunctions
+from lifeactuary.annuities_certain import Annuities_Certain
+from lifeactuary.read_soa_table_xml import SoaTable
+
+baseline_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+tables_folder = os.path.join(root, 'soa_tables')
+reference_table = 'GRF95.xml'
+batch_size = 100000
+seed = 0
+
+# functions that are not benchmarked: they build DataFrames, change the table, or are decorators and settings
+skipped = ('df_life_table', 'df_commutation_table', 'force_qw_0', 'set_msn_mode', 'check_terms', 'check_grow',
+           'iter_simulated_lifetimes')
+
+# values of the arguments of the scalar functions, by name
+scalar_arguments = {'x': 40, 'n': 10, 't': 2, 'm': 4, 'defer': 5, 'first_amount': 1, 'increase_amount': 1,
+                    'method': 'udd', 'terms': 20, 'payment': 1, 'increase': 1, 'grow': 1, 'interest_rate': 3}
+
+
+def array_arguments(table, rng, size=batch_size):
+    '''
+    Arrays of the arguments of the array functions, by name, with valid values for the table.
+    '''
+    return {'x': rng.integers(table.x0, table.w - 1, size), 'n': rng.integers(1, 30, size),
+            't': rng.uniform(table.x0, table.w, size), 'm': rng.choice([1, 2, 4, 12], size),
+            'defer': rng.integers(0, 10, size), 'first_amount': rng.uniform(1, 10, size),
+            'increase_amount': rng.uniform(0, 1, size), 'terms': rng.integers(1, 40, size),
+            'payment': rng.uniform(1, 10, size), 'increase': rng.uniform(0, 1, size),
+            'grow': rng.uniform(0, 2, size), 'interest_rate': rng.uniform(0, 6, size), 'size': size}
+
+
+def public_functions(cls):
+    '''
+    Public functions of a class, with their names, skipping the ones in skipped.
+    '''
+    return [(name, function) for name, function in inspect.getmembers(cls, inspect.isfunction)
+            if not name.startswith('_') and name not in skipped]
+
+
+def parameters(function, start=1):
+    return list(inspect.signature(function).parameters)[start:]
+
+
+def best_time(statement, repeat=5, min_time=.05):
+    '''
+    Minimum time, in seconds, of one execution of statement, over repeat runs of timeit of at least min_time each.
+    '''
+    timer = timeit.Timer(statement)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def peak_memory(statement):
+    '''
+    Bytes allocated at the peak of one execution of statement, above the memory in use before it.
+    '''
+    tracemalloc.start()
+    try:
+        statement()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def construction_benchmarks():
+    for table_name in sorted(glob.glob(os.path.join(tables_folder, '*.xml'))):
+        table = os.path.basename(table_name)[:-4]
+        mt = SoaTable(table_name).table_qx
+        builders = {'MortalityTable': lambda: MortalityTable(mt=mt, msn_mode='off'),
+                    'CommutationFunctions': lambda: CommutationFunctions(i=2, mt=mt, msn_mode='off'),
+                    'CommutationFunctions.all_columns':
+                        lambda: [getattr(CommutationFunctions(i=2, mt=mt, msn_mode='off'), col)
+                                 for col in ('Dx', 'Nx', 'Sx', 'Cx', 'Mx', 'Rx')],
+                    'SoaTable.xml': lambda: SoaTable(table_name, cache=False)}
+        for name, builder in builders.items():
+            yield f"construction.{name}.{table}", 'seconds', builder, builder
+
+
+def latency_benchmarks(cf):
+    for cls, instance in ((MortalityTable, cf), (CommutationFunctions, cf), (Annuities_Certain,
+                                                                            Annuities_Certain(3, 4))):
+        for name, function in public_functions(cls):
+            if name.endswith('_array') or name == 'tpx_matrix' or (cls is CommutationFunctions and
+                                                                     hasattr(MortalityTable, name)):
+                continue
+            if name == 'present_value':
+                k = np.arange(30)
+                kwargs = {'probs': cf.npx_array(40, k), 'age': 40, 'spot_rates': np.full(30, 3.),
+                          'capital': np.ones(30)}
+            elif name == 'simulate_lifetimes':
+                kwargs = {'x': 40, 'size': 1}
+            else:
+                kwargs = {p: scalar_arguments[p] for p in parameters(function) if p in scalar_arguments}
+            method = getattr(instance, name)
+            call = lambda method=method, kwargs=kwargs: method(**kwargs)
+            yield f"latency.{cls.__name__}.{name}", 'seconds', call, None
+
+
+def throughput_benchmarks(cf):
+    rng = np.random.default_rng(seed)
+    values = array_arguments(cf, rng)
+    for cls, instance in ((MortalityTable, cf), (CommutationFunctions, cf), (Annuities_Certain, None)):
+        for name, function in public_functions(cls):
+            if not (name.endswith('_array') or name in ('tpx_matrix', 'simulate_lifetimes')) or \
+                    (cls is CommutationFunctions and hasattr(MortalityTable, name)):
+                continue
+            if name == 'present_value_array':
+                kwargs = {'probs': cf.tpx_matrix(values['x'][:batch_size // 30], 30), 'ages': 40,
+                          'spot_rates': np.full(30, 3.), 'capitals': np.ones(30)}
+            elif name == 'tpx_matrix':
+                kwargs = {'x': values['x'][:batch_size // 30], 'n': 30}
+            elif name == 'simulate_lifetimes':
+                kwargs = {'x': 40, 'size': batch_size, 'seed': seed}
+            else:
+                start = 0 if cls is Annuities_Certain else 1
+                kwargs = {p: values[p] for p in parameters(function, start) if p in values}
+            method = getattr(cls, name) if instance is None else getattr(instance, name)
+            call = lambda method=method, kwargs=kwargs: method(**kwargs)
+            yield f"throughput.{cls.__name__}.{name}", 'elements/second', call, call
+
+
+def run(name_filter=None):
+    '''
+    Runs the benchmarks whose name contains name_filter.
+
+    :return: dictionary {benchmark name: {metric: value}}
+    '''
+    cf = CommutationFunctions(i=3, mt=SoaTable(os.path.join(tables_folder, reference_table)).table_qx,
+                              msn_mode='off')
+    results = {}
+    for benchmarks in (construction_benchmarks(), latency_benchmarks(cf), throughput_benchmarks(cf)):
+        for name, unit, statement, memory_statement in benchmarks:
+            if name_filter and name_filter not in name:
+                continue
+            seconds = best_time(statement)
+            result = {'seconds': seconds} if unit == 'seconds' else {'elements/second': batch_size / seconds}
+            if memory_statement is not None:
+                result['peak_memory'] = peak_memory(memory_statement)
+            results[name] = result
+            print(f"{name:<60} " + ' '.join(f"{metric}={value:.4g}" for metric, value in result.items()))
+    return results
+
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'system': platform.system()}
+
+
+def compare(results, baseline, threshold):
+    '''
+    Compares the results with the baseline. Times and memory are worse when higher and throughputs when lower.
+
+    :return: list with the regressions (name, metric, baseline value, current value, ratio)
+    '''
+    regressions = []
+    for name, result in results.items():
+        for metric, value in result.items():
+            base = baseline.get(name, {}).get(metric)
+            if not base or not value:
+                continue
+            ratio = base / value if metric == 'elements/second' else value / base
+            if ratio > threshold:
+                regressions.append((name, metric, base, value, ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark suite of lifeactuary')
+    parser.add_argument('--save', action='store_true', help='save the results as the baseline')
+    parser.add_argument('--filter', default=None, help='only the benchmarks whose name contains this text')
+    parser.add_argument('--threshold', type=float, default=2.,
+                        help='ratio to the baseline reported as a regression (default 2)')
+    parser.add_argument('--fail', action='store_true', help='exit with 1 if there are regressions')
+    args = parser.parse_args()
+
+    results = run(args.filter)
+    if args.save:
+        # with a filter, only the benchmarks that were run are replaced in the baseline
+        saved = {}
+        if args.filter and os.path.exists(baseline_file):
+            with open(baseline_file) as f:
+                saved = json.load(f)['results']
+        saved.update(results)
+        with open(baseline_file, 'w') as f:
+            json.dump({'environment': environment(), 'batch_size': batch_size, 'results': saved}, f, indent=1,
+                      sort_keys=True)
+        print(f"baseline saved to {baseline_file}")
+    elif os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        if baseline['environment'] != environment():
+            print(f"warning: the baseline was run in another environment {baseline['environment']}")
+        regressions = compare(results, baseline['results'], args.threshold)
+        print(f"{len(regressions)} regressions (threshold {args.threshold}) in {len(results)} benchmarks")
+        for name, metric, base, value, ratio in regressions:
+            print(f"{name:<60} {metric}: {base:.4g} -> {value:.4g} ({ratio:.2f}x worse)")
+        if args.fail and regressions:
+            sys.exit(1)
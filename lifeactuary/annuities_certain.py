@@ -173,8 +173,213 @@ class Annuities_Certain:
         '''
         a1 = (1 - self.v) / self.im
         if self.interest_rate == grow / 100:
-            return a1 * terms
+            return payment * a1 * terms
         ig = (self.interest_rate - grow / 100) / (1 + grow / 100)
         vg = 1 / (1 + ig)
         a2 = (1 - vg ** terms) / (1 - vg)
         return payment * a1 * a2
+
+    ### Array versions, broadcasting over arrays of terms, interest rates, frequencies, payments and growth rates.
+    ### Invalid elements (negative rates, non integer frequencies or terms, ...) are nan.
+
+    @staticmethod
+    def __rates(interest_rate, m):
+        '''
+        Rates of the array versions: the annual rate, v, the nominal rate im, vm and dm, for arrays of interest rates
+        (in percentage) and frequencies, and the mask of the valid elements.
+        '''
+        i = np.asarray(interest_rate, dtype=float) / 100.
+        m = np.asarray(m, dtype=float)
+        valid = (i >= 0) & (m >= 1) & (m == np.floor(m))
+        m = np.where(valid, m, 1.)
+        i = np.where(valid, i, 0.)
+        v = 1 / (1 + i)
+        im = m * (np.power(1 + i, 1 / m) - 1)
+        vm = 1 / (1 + im / m)
+        return i, m, v, im, vm, im * vm, valid
+
+    @staticmethod
+    def __terms(terms):
+        terms = np.asarray(0 if terms is None else terms, dtype=float)
+        return terms, (terms >= 0) & (terms == np.floor(terms))
+
+    @staticmethod
+    def aan_array(interest_rate, terms, m=1):
+        '''
+        Array version of aan.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms, where 0 is a perpetuity
+        :param m: array of frequencies
+        :return: array of present values
+        '''
+        i, m, v, im, vm, dm, valid = Annuities_Certain.__rates(interest_rate, m)
+        terms, valid_terms = Annuities_Certain.__terms(terms)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = np.where(terms == 0, 1 / dm, (1 - np.power(vm, terms * m)) / dm)
+        return np.where(valid & valid_terms, aux, np.nan)
+
+    @staticmethod
+    def an_array(interest_rate, terms, m=1):
+        '''
+        Array version of an.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms, where 0 is a perpetuity
+        :param m: array of frequencies
+        :return: array of present values
+        '''
+        i, m, v, im, vm, dm, valid = Annuities_Certain.__rates(interest_rate, m)
+        terms, valid_terms = Annuities_Certain.__terms(terms)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = np.where(terms == 0, 1 / im, (1 - np.power(vm, terms * m)) / im)
+        return np.where(valid & valid_terms, aux, np.nan)
+
+    @staticmethod
+    def Imaan_array(interest_rate, terms, m=1, payment=1, increase=1):
+        '''
+        Array version of Imaan.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms
+        :param m: array of frequencies
+        :param payment: array of first payments
+        :param increase: array of increases
+        :return: array of present values
+        '''
+        vm = Annuities_Certain.__rates(interest_rate, m)[4]
+        return Annuities_Certain.Iman_array(interest_rate, terms, m, payment, increase) / vm
+
+    @staticmethod
+    def Iman_array(interest_rate, terms, m=1, payment=1, increase=1):
+        '''
+        Array version of Iman.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms
+        :param m: array of frequencies
+        :param payment: array of first payments
+        :param increase: array of increases
+        :return: array of present values
+        '''
+        i, m, v, im, vm, dm, valid = Annuities_Certain.__rates(interest_rate, m)
+        terms, valid_terms = Annuities_Certain.__terms(terms)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = (payment - increase) * Annuities_Certain.an_array(interest_rate, terms, m) \
+                + increase * v * (v ** terms * ((terms * m) * (vm - 1) - 1) + 1) \
+                / (m * v ** ((m - 1) / m) * (vm - 1) ** 2)
+        return np.where(valid & valid_terms & (payment + increase * terms >= 0), aux, np.nan)
+
+    @staticmethod
+    def Iaan_array(interest_rate, terms, m=1, payment=1, increase=1):
+        '''
+        Array version of Iaan.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms
+        :param m: array of frequencies
+        :param payment: array of first payments
+        :param increase: array of increases
+        :return: array of present values
+        '''
+        vm = Annuities_Certain.__rates(interest_rate, m)[4]
+        return Annuities_Certain.Ian_array(interest_rate, terms, m, payment, increase) / vm
+
+    @staticmethod
+    def Ian_array(interest_rate, terms, m=1, payment=1, increase=1):
+        '''
+        Array version of Ian.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms
+        :param m: array of frequencies
+        :param payment: array of first payments
+        :param increase: array of increases
+        :return: array of present values
+        '''
+        i, m, v, im, vm, dm, valid = Annuities_Certain.__rates(interest_rate, m)
+        terms, valid_terms = Annuities_Certain.__terms(terms)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = payment * Annuities_Certain.an_array(interest_rate, terms, m) + increase / im * (
+                    (1 - v ** terms) / i - terms * v ** terms)
+        return np.where(valid & valid_terms & (payment + increase * terms >= 0), aux, np.nan)
+
+    @staticmethod
+    def __grow(interest_rate, terms, m, grow):
+        '''
+        Rates of the array versions of the annuities with payments growing geometrically, and the mask of the valid
+        elements.
+        '''
+        i, m, v, im, vm, dm, valid = Annuities_Certain.__rates(interest_rate, m)
+        terms, valid_terms = Annuities_Certain.__terms(terms)
+        g = np.asarray(grow, dtype=float) / 100.
+        valid = valid & valid_terms & (g > -1)
+        g = np.where(valid, g, 0.)
+        return i, m, v, im, vm, terms, g, (1 + g) * v, valid
+
+    @staticmethod
+    def Gaan_array(interest_rate, terms, m=1, payment=1, grow=0):
+        '''
+        Array version of Gaan.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms
+        :param m: array of frequencies
+        :param payment: array of first payments
+        :param grow: array of rates of growth, in percentage
+        :return: array of present values
+        '''
+        i, m_, v, im, vm, terms_, g, vg, valid = Annuities_Certain.__grow(interest_rate, terms, m, grow)
+        return Annuities_Certain.Gan_array(interest_rate, terms, m, payment, grow) / vg ** (1 / m_)
+
+    @staticmethod
+    def Gan_array(interest_rate, terms, m=1, payment=1, grow=0):
+        '''
+        Array version of Gan.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms
+        :param m: array of frequencies
+        :param payment: array of first payments
+        :param grow: array of rates of growth, in percentage
+        :return: array of present values
+        '''
+        i, m, v, im, vm, terms, g, vg, valid = Annuities_Certain.__grow(interest_rate, terms, m, grow)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = np.where(i == g, payment * terms * vm,
+                           payment / (1 + g) ** (1 / m) * (1 - vg ** terms) / (1 - vg ** (1 / m)) * vg ** (1 / m) / m)
+        return np.where(valid, aux, np.nan)
+
+    @staticmethod
+    def Gmaan_array(interest_rate, terms, m=1, payment=1, grow=0):
+        '''
+        Array version of Gmaan.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms
+        :param m: array of frequencies
+        :param payment: array of first payments
+        :param grow: array of rates of growth, in percentage
+        :return: array of present values
+        '''
+        i, m_, v, im, vm, terms_, g, vg, valid = Annuities_Certain.__grow(interest_rate, terms, m, grow)
+        return Annuities_Certain.Gman_array(interest_rate, terms, m, payment, grow) / vg ** (1 / m_)
+
+    @staticmethod
+    def Gman_array(interest_rate, terms, m=1, payment=1, grow=0):
+        '''
+        Array version of Gman.
+
+        :param interest_rate: array of interest rates, in percentage
+        :param terms: array of terms
+        :param m: array of frequencies
+        :param payment: array of first payments
+        :param grow: array of rates of growth, in percentage
+        :return: array of present values
+        '''
+        i, m, v, im, vm, terms, g, vg, valid = Annuities_Certain.__grow(interest_rate, terms, m, grow)
+        a1 = (1 - v) / im
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vg_ = (1 + g) / (1 + i)
+            aux = np.where(i == g, payment * a1 * terms, payment * a1 * (1 - vg_ ** terms) / (1 - vg_))
+        return np.where(valid, aux, np.nan)
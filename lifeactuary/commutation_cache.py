@@ -0,0 +1,143 @@
+__author__ = "PedroCR"
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from lifeactuary.commutation_table import CommutationFunctions
+
+_columns = ('lx', 'px', 'qx', 'dx', 'ex')
+# the commutation columns are computed on first access, all with the length of Dx
+_commutation_columns = ('Dx', 'Nx', 'Sx', 'Cx', 'Mx', 'Rx')
+
+
+class CommutationCache:
+    '''
+    Least recently used (LRU) cache of CommutationFunctions, so that the same basis (mortality table, interest rate,
+    growth rate, percentage of qx and continuous approach) is only built once per process.
+    The cached instances are shared, so they are read-only: the formulas are not kept in msn (msn_mode='off') and
+    the arrays of the table cannot be changed. It is safe to use the same cache, and the same instances, from
+    several threads.
+
+    :param max_size: maximum number of tables kept in the cache
+    :param max_bytes: maximum memory, in bytes, used by the arrays of the tables kept in the cache. Use None for no limit
+    '''
+
+    def __init__(self, max_size=64, max_bytes=None):
+        self.__max_size = max_size
+        self.__max_bytes = max_bytes
+        self.__tables = OrderedDict()
+        self.__nbytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.max_size, self.max_bytes}"
+
+    # getters and setters
+    @property
+    def max_size(self):
+        return self.__max_size
+
+    @property
+    def max_bytes(self):
+        return self.__max_bytes
+
+    @staticmethod
+    def key(i, g=0, data_type='q', mt=None, perc=100, app_cont=False):
+        '''
+        Key of a basis in the cache: a hash of the mortality table together with the parameters of the basis.
+
+        :return: tuple identifying the basis
+        '''
+        mt_hash = hashlib.sha1(np.ascontiguousarray(mt, dtype=float).tobytes()).hexdigest()
+        return mt_hash, data_type, float(i), float(g), float(perc), bool(app_cont)
+
+    @staticmethod
+    def nbytes(cf):
+        '''
+        Memory, in bytes, used by the arrays of a CommutationFunctions instance, once all its commutation columns are
+        computed. The commutation columns are not computed to obtain it.
+        '''
+        return sum(np.asarray(getattr(cf, col)).nbytes for col in _columns) + \
+            len(_commutation_columns) * cf.lx[:-1].nbytes
+
+    def get(self, i, g=0, data_type='q', mt=None, perc=100, app_cont=False):
+        '''
+        Returns the CommutationFunctions for the basis, building it only if it is not in the cache.
+
+        :param i: interest rate, in percentage. Use 5 for 5%
+        :param g: rate of growing (in percentage), for capitals evolving geometrically
+        :param data_type: Use 'l' for lx, 'p' for px and 'q' for qx.
+        :param mt: the mortality table, in array format, according to the data_type defined
+        :param perc: The percentage of qx to use, e.g., use 50 for 50%
+        :param app_cont: Use 'True' for continuous approach or 'False' for death payments at the end of the year
+        :return: a read-only CommutationFunctions instance, or None if the basis is not valid
+        '''
+        if i is None or mt is None or len(mt) == 0 or data_type not in ('l', 'q', 'p'):
+            return None
+        key = self.key(i, g, data_type, mt, perc, app_cont)
+        with self.__lock:
+            cf = self.__tables.get(key)
+            if cf is not None:
+                self.__tables.move_to_end(key)
+                self.__hits += 1
+                return cf
+            self.__misses += 1
+
+        # the table is built outside the lock, so that other threads are not blocked meanwhile
+        cf = CommutationFunctions(i=i, g=g, data_type=data_type, mt=list(mt), perc=perc, app_cont=app_cont,
+                                  msn_mode='off')
+        # the commutation columns computed later are read-only as well, as lx is
+        for col in _columns:
+            getattr(cf, col).flags.writeable = False
+        cf_nbytes = self.nbytes(cf)
+
+        with self.__lock:
+            if key in self.__tables:
+                self.__tables.move_to_end(key)
+                return self.__tables[key]
+            self.__tables[key] = cf
+            self.__nbytes += cf_nbytes
+            while len(self.__tables) > 1 and (len(self.__tables) > self.__max_size or
+                                              (self.__max_bytes is not None and self.__nbytes > self.__max_bytes)):
+                _, old_cf = self.__tables.popitem(last=False)
+                self.__nbytes -= self.nbytes(old_cf)
+                self.__evictions += 1
+        return cf
+
+    def stats(self):
+        '''
+        Statistics of the use of the cache.
+
+        :return: dictionary with the number of hits, misses and evictions, and the number of tables and bytes cached
+        '''
+        with self.__lock:
+            return {'hits': self.__hits, 'misses': self.__misses, 'evictions': self.__evictions,
+                    'size': len(self.__tables), 'nbytes': self.__nbytes}
+
+    def clear(self):
+        '''
+        Removes all the tables from the cache and resets the statistics.
+        '''
+        with self.__lock:
+            self.__tables.clear()
+            self.__nbytes = 0
+            self.__hits = 0
+            self.__misses = 0
+            self.__evictions = 0
+
+
+# process-wide cache
+commutation_cache = CommutationCache()
+
+
+def get_commutation_functions(i, g=0, data_type='q', mt=None, perc=100, app_cont=False):
+    '''
+    Returns the CommutationFunctions for a basis from the process-wide cache, building it only once.
+    See CommutationCache.get.
+    '''
+    return commutation_cache.get(i=i, g=g, data_type=data_type, mt=mt, perc=perc, app_cont=app_cont)
@@ -1,7 +1,6 @@
 __author__ = "PedroCR"
 
 import numpy as np
-import pandas as pd
 from lifeactuary.mortality_table import MortalityTable
 
 
@@ -17,12 +16,19 @@ class CommutationFunctions(MortalityTable):
     :param perc: The percentage of qx to use, e.g., use 50 for 50%
     :param app_cont: Use 'True' for continuous approach (deaths occur, in average, in the middle of the year and payments are
         due in the moment of death) or 'False' for considering that death payments are due in the end of the year
+    :param msn_mode: How the formulas used in the computations are kept in msn: 'off', 'ring' or 'full'
+    :param msn_size: The number of formulas kept when msn_mode is 'ring'
+    :param columns: Dictionary with the arrays of the table already built (lx, px, qx, dx, ex and, optionally, Dx, Nx,
+        Sx, Cx, Mx, Rx), e.g., by a TableStore, that are used as they are instead of being computed
+    :param last_q: The value for qw, as in MortalityTable
 
     :return: the commutation symbols Dx, Nx, Sx, Cx, Mx, Rx.
     '''
 
-    def __init__(self, i=None, g=0, data_type='q', mt=None, perc=100, app_cont=False):
-        MortalityTable.__init__(self, data_type, mt, perc)
+    def __init__(self, i=None, g=0, data_type='q', mt=None, perc=100, app_cont=False, msn_mode='full', msn_size=1000,
+                 columns=None, last_q=1):
+        MortalityTable.__init__(self, data_type, mt, perc, last_q=last_q, msn_mode=msn_mode, msn_size=msn_size,
+                                columns=columns)
         if i is None:
             return
         self.__i = i / 100.
@@ -32,17 +38,15 @@ class CommutationFunctions(MortalityTable):
         self.__app_cont = app_cont
         self.__cont = np.sqrt(1 + self.__i)
 
-        # self.__Dx = np.array([self.lx[x] * np.power(self__d, x) for x in range(len(self.lx))])
-        self.__Dx = self.lx[:-1] * np.power(self.__d, range(len(self.lx[:-1])))
-        self.__Nx = np.array([np.sum(self.__Dx[x:]) for x in range(len(self.lx[:-1]))])
-        self.__Sx = np.array([np.sum(self.__Nx[x:]) for x in range(len(self.__Nx))])
-        self.__Cx = self.dx * np.power(self.__d, range(1, len(self.dx) + 1))
-        self.__Mx = np.array([np.sum(self.__Cx[x:]) for x in range(len(self.__Cx))])
-        self.__Rx = np.array([np.sum(self.__Mx[x:]) for x in range(len(self.__Mx))])
-        if self.__app_cont:
-            self.__Cx = self.__Cx * self.__cont
-            self.__Mx = self.__Mx * self.__cont
-            self.__Rx = self.__Rx * self.__cont
+        # the commutation columns are computed on first access (see the getters), as most uses only need some of them,
+        # unless they are given in columns
+        columns = {} if columns is None else columns
+        self.__Dx = columns.get('Dx')
+        self.__Nx = columns.get('Nx')
+        self.__Sx = columns.get('Sx')
+        self.__Cx = columns.get('Cx')
+        self.__Mx = columns.get('Mx')
+        self.__Rx = columns.get('Rx')
 
     def __repr__(self):
         return f"{self.__class__.__name__}{self.i, self.g, self.data_type, self.mt, self.perc, self.app_cont}"
@@ -74,31 +78,66 @@ class CommutationFunctions(MortalityTable):
 
     @property
     def Dx(self):
+        if self.__Dx is None:
+            self.__Dx = self.__lazy(self.lx[:-1] * self.discount_factors()[:-1])
         return self.__Dx
 
     @property
     def Nx(self):
+        if self.__Nx is None:
+            self.__Nx = self.__lazy(self.__reverse_cumsum(self.Dx))
         return self.__Nx
 
     @property
     def Sx(self):
+        if self.__Sx is None:
+            self.__Sx = self.__lazy(self.__reverse_cumsum(self.Nx))
         return self.__Sx
 
     @property
     def Cx(self):
+        if self.__Cx is None:
+            self.__Cx = self.__lazy(self.dx * self.discount_factors()[1:] * (self.__cont if self.__app_cont else 1))
         return self.__Cx
 
     @property
     def Mx(self):
+        if self.__Mx is None:
+            self.__Mx = self.__lazy(self.__reverse_cumsum(self.Cx))
         return self.__Mx
 
     @property
     def Rx(self):
+        if self.__Rx is None:
+            self.__Rx = self.__lazy(self.__reverse_cumsum(self.Mx))
         return self.__Rx
 
+    @staticmethod
+    def __reverse_cumsum(column):
+        '''
+        Sums of the column from age x to w, for each age x (Nx, Sx, Mx and Rx come from Dx, Nx, Cx and Mx).
+        '''
+        return np.cumsum(column[::-1])[::-1]
+
+    def __lazy(self, column):
+        '''
+        A column computed on first access is read-only if the table is (e.g., the tables of CommutationCache).
+        '''
+        column.flags.writeable = self.lx.flags.writeable
+        return column
+
+    def discount_factors(self):
+        '''
+        Factors used to build Dx and Cx, from age 0 to each age x=0,...,w+1: ((1+g)/(1+i))^x.
+        Subclasses may override it, e.g., to discount with a term structure of interest rates.
+
+        :return: array with the factors, for ages 0 to w+1
+        '''
+        return np.power(self.__d, np.arange(len(self.lx)))
 
     def df_commutation_table(self):
-        data = {'Dx': self.__Dx, 'Nx': self.__Nx, 'Sx': self.__Sx, 'Cx': self.__Cx, 'Mx': self.__Mx, 'Rx': self.__Rx}
+        import pandas as pd
+        data = {'Dx': self.Dx, 'Nx': self.Nx, 'Sx': self.Sx, 'Cx': self.Cx, 'Mx': self.Mx, 'Rx': self.Rx}
         df = pd.DataFrame(data)
         data_lf = self.df_life_table()
         df = pd.concat([data_lf, df], axis=1, sort=False)
@@ -124,8 +163,9 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x >= self.w:
             return 0
-        aux = self.__Nx[x + 1] / self.__Dx[x] / (1 + self.__g) + (m - 1) / (m * 2)
-        self.msn.append(f"ax_{x}={self.__Nx[x + 1]}/{self.__Dx[x]}+({m}-1)/({m}*2)")
+        aux = self.Nx[x + 1] / self.Dx[x] / (1 + self.__g) + (m - 1) / (m * 2)
+        if self.msn_on:
+            self.msn.append(f"ax_{x}={self.Nx[x + 1]}/{self.Dx[x]}+({m}-1)/({m}*2)")
         return aux
 
     def aax(self, x, m=1):
@@ -140,8 +180,9 @@ class CommutationFunctions(MortalityTable):
         """
         if x > self.w:
             return 1
-        aux = self.__Nx[x] / self.__Dx[x] - (m - 1) / (m * 2)
-        self.msn.append(f"aax_{x}={self.__Nx[x]}/{self.__Dx[x]}-({m}-1)/({m}*2)")
+        aux = self.Nx[x] / self.Dx[x] - (m - 1) / (m * 2)
+        if self.msn_on:
+            self.msn.append(f"aax_{x}={self.Nx[x]}/{self.Dx[x]}-({m}-1)/({m}*2)")
         return aux
 
     # Deferred Whole Life Annuities
@@ -161,8 +202,9 @@ class CommutationFunctions(MortalityTable):
         # note: nEx discounts the growth rate np.power(1 + self.__g, defer + 1)
         aux = self.ax(x + defer, m) * self.nEx(x, defer)
         if aux > 0:
-            self.msn.append(f"{defer}_ax_{x}=[{self.__Nx[x + 1 + defer]}/{self.__Dx[x + defer]}+({m} + 1)/({m}*2)]"
-                            f"*{self.__Dx[x + defer]}/{self.__Dx[x]}")
+            if self.msn_on:
+                self.msn.append(f"{defer}_ax_{x}=[{self.Nx[x + 1 + defer]}/{self.Dx[x + defer]}+({m} + 1)/({m}*2)]"
+                                f"*{self.Dx[x + defer]}/{self.Dx[x]}")
         return aux
 
     def t_aax(self, x, m=1, defer=0):
@@ -178,8 +220,9 @@ class CommutationFunctions(MortalityTable):
         """
         aux = self.aax(x + defer, m) * self.nEx(x, defer)
         if x + defer < self.w:
-            self.msn.append(f"{defer}_aax_{x}=[{self.__Nx[x + defer]}/{self.__Dx[x + defer]}-({m}-1)/({m}*2)]"
-                            f"*{self.__Dx[x + defer]}/{self.__Dx[x]}")
+            if self.msn_on:
+                self.msn.append(f"{defer}_aax_{x}=[{self.Nx[x + defer]}/{self.Dx[x + defer]}-({m}-1)/({m}*2)]"
+                                f"*{self.Dx[x + defer]}/{self.Dx[x]}")
         return aux
 
     ## Temporary Life Annuities
@@ -205,10 +248,11 @@ class CommutationFunctions(MortalityTable):
             return 0
 
         if x + 1 + n <= self.w:
-            aux = (self.__Nx[x + 1] - self.__Nx[x + 1 + n]) / self.__Dx[x] / (1 + self.__g) + \
+            aux = (self.Nx[x + 1] - self.Nx[x + 1 + n]) / self.Dx[x] / (1 + self.__g) + \
                   (m - 1) / (m * 2) * (1 - self.nEx(x, n))
-            self.msn.append(f"{n}_ax_{x}={self.__Nx[x + 1] - self.__Nx[x + 1 + n]}/{self.__Dx[x]}+({m}-1)/({m}*2)*"
-                            f"(1-{self.__Dx[x + n]}/{self.__Dx[x]})")
+            if self.msn_on:
+                self.msn.append(f"{n}_ax_{x}={self.Nx[x + 1] - self.Nx[x + 1 + n]}/{self.Dx[x]}+({m}-1)/({m}*2)*"
+                                f"(1-{self.Dx[x + n]}/{self.Dx[x]})")
         else:
             return self.ax(x=x, m=m)
 
@@ -235,14 +279,15 @@ class CommutationFunctions(MortalityTable):
             return 0
 
         if x + 1 + n <= self.w + 1:
-            aux = (self.__Nx[x] - self.__Nx[x + n]) / self.__Dx[x] - (m - 1) / (m * 2) * (1 - self.nEx(x, n))
+            aux = (self.Nx[x] - self.Nx[x + n]) / self.Dx[x] - (m - 1) / (m * 2) * (1 - self.nEx(x, n))
             if x + 1 + n <= self.w:
-                Nx2 = self.__Nx[x + 1 + n]
+                Nx2 = self.Nx[x + 1 + n]
             else:
                 Nx2 = 0
-            self.msn.append(
-                f"{n}_aax_{x}={self.__Nx[x + 1] - Nx2}/{self.__Dx[x]}*(1+{self.__g}) + ({m}+1)/({m}*2)*"
-                f"(1-{self.__Dx[x + n]}/{self.__Dx[x]})")
+            if self.msn_on:
+                self.msn.append(
+                    f"{n}_aax_{x}={self.Nx[x + 1] - Nx2}/{self.Dx[x]}*(1+{self.__g}) + ({m}+1)/({m}*2)*"
+                    f"(1-{self.Dx[x + n]}/{self.Dx[x]})")
         else:
             return self.aax(x=x, m=m)
         return aux
@@ -263,10 +308,11 @@ class CommutationFunctions(MortalityTable):
         """
         aux = self.nax(x + defer, n, m) * self.nEx(x, defer)
         if x + 1 + n + defer <= self.w:
-            self.msn.append(
-                f"{defer}|{n}_ax_{x}=[{self.__Nx[x + 1 + defer] - self.__Nx[x + 1 + n + defer]}/{self.__Dx[x + defer]}"
-                f"+ ({m}-1)/({m}*2)*(1-{self.__Dx[x + n + defer]}/{self.__Dx[x + defer]})]"
-                f"*{self.__Dx[x + defer]}/{self.__Dx[x]}")
+            if self.msn_on:
+                self.msn.append(
+                    f"{defer}|{n}_ax_{x}=[{self.Nx[x + 1 + defer] - self.Nx[x + 1 + n + defer]}/{self.Dx[x + defer]}"
+                    f"+ ({m}-1)/({m}*2)*(1-{self.Dx[x + n + defer]}/{self.Dx[x + defer]})]"
+                    f"*{self.Dx[x + defer]}/{self.Dx[x]}")
         else:
             return self.t_ax(x=x, m=m, defer=defer)
         return aux
@@ -286,13 +332,14 @@ class CommutationFunctions(MortalityTable):
         aux = self.naax(x + defer, n, m) * self.nEx(x, defer)
         if x + 1 + n + defer <= self.w + 1:
             if x + 1 + n + defer <= self.w:
-                Nx2 = self.__Nx[x + 1 + n + defer]
+                Nx2 = self.Nx[x + 1 + n + defer]
             else:
                 Nx2 = 0
-            self.msn.append(
-                f"{defer}|{n}_aax_{x}=[{self.__Nx[x + 1 + defer] - Nx2}/{self.__Dx[x + defer]}"
-                f"+({m}+1)/({m}*2)*(1-{self.__Dx[x + n + defer]}/{self.__Dx[x + defer]})]"
-                f"*{self.__Dx[x + defer]}/{self.__Dx[x]}")
+            if self.msn_on:
+                self.msn.append(
+                    f"{defer}|{n}_aax_{x}=[{self.Nx[x + 1 + defer] - Nx2}/{self.Dx[x + defer]}"
+                    f"+({m}+1)/({m}*2)*(1-{self.Dx[x + n + defer]}/{self.Dx[x + defer]})]"
+                    f"*{self.Dx[x + defer]}/{self.Dx[x]}")
         else:
             return self.t_aax(x=x, m=m, defer=defer)
         return aux
@@ -301,6 +348,31 @@ class CommutationFunctions(MortalityTable):
 
     # Annuities Increasing and Decreasing Arithmetically
 
+    def __sum_t_nax(self, x, a, n, m):
+        '''
+        Sum, for j=1,...,n-1, of the immediate (n-j)-year temporary life annuities for a life aged x, deferred until age
+        a+j. Obtained from the columns Sx, Nx and Dx, so it only holds when there is no geometric growth (g=0).
+        Accepts arrays.
+        '''
+        D_x = self.Dx[np.clip(x, 0, self.w)]
+        annual = (self.__at(self.Sx, a + 2) - self.__at(self.Sx, a + n + 1) -
+                  (n - 1) * self.__at(self.Nx, a + n + 1)) / D_x
+        # as in t_nax, the annuities reaching age w are valued as whole life annuities
+        D_a_n = np.where(a + n >= self.w, 0., self.__at(self.Dx, a + n))
+        fractional = (self.__at(self.Nx, a + 1) - self.__at(self.Nx, a + n) - (n - 1) * D_a_n) / D_x
+        # there are no increases for n <= 1 (the sum is empty)
+        return np.where(n <= 1, 0., annual + (m - 1) / (m * 2) * fractional)
+
+    def __sum_t_nAx(self, x, a, n, moment):
+        '''
+        Sum, for j=1,...,n-1, of the (n-j)-year term life insurances for a life aged x, deferred until age a+j.
+        Obtained from the columns Rx, Mx and Dx, so it only holds when there is no geometric growth (g=0).
+        Accepts arrays.
+        '''
+        D_x = self.Dx[np.clip(x, 0, self.w)]
+        aux = self.__at(self.Rx, a + 1) - self.__at(self.Rx, a + n) - (n - 1) * self.__at(self.Mx, a + n)
+        return np.where(n <= 1, 0., aux * self.__death_factor(moment) / D_x)
+
     def t_nIax(self, x, n, m=1, defer=0, first_amount=1, increase_amount=1):
         '''
         Returns the actuarial present value of an immediate n term life annuity, deferred $t$ periods,
@@ -323,11 +395,18 @@ class CommutationFunctions(MortalityTable):
         if x + n + defer > self.w:
             return .0
 
+        if x < 0:
+            return np.nan
+        if n <= 0:
+            return .0
+
         term1 = first_amount * self.t_nax(x=x, n=n, m=m, defer=defer)
-        list_increases = [increase_amount * self.t_nax(x=x + defer, n=n - j, m=m, defer=defer + j)
-                          for j in range(1, n)]
+        if self.__g != 0:
+            list_increases = [increase_amount * self.t_nax(x=x, n=n - j, m=m, defer=defer + j)
+                              for j in range(1, n)]
+            return term1 + sum(list_increases)
 
-        return term1 + sum(list_increases)
+        return term1 + increase_amount * float(self.__sum_t_nax(x, x + defer, n, m))
 
     def t_nIaax(self, x, n, m=1, defer=0, first_amount=1, increase_amount=1):
         '''
@@ -352,11 +431,18 @@ class CommutationFunctions(MortalityTable):
         if x + n + defer > self.w:
             return .0
 
+        if x < 0:
+            return np.nan
+        if n <= 0:
+            return .0
+
         term1 = first_amount * self.t_naax(x=x, n=n, m=m, defer=defer)
-        list_increases = [increase_amount * self.t_nax(x=x + defer, n=n-j, m=m, defer=defer + j - 1)
-                          for j in range(1, n)]
+        if self.__g != 0:
+            list_increases = [increase_amount * self.t_nax(x=x, n=n - j, m=m, defer=defer + j - 1)
+                              for j in range(1, n)]
+            return term1 + sum(list_increases)
 
-        return term1+sum(list_increases)
+        return term1 + increase_amount * float(self.__sum_t_nax(x, x + defer - 1, n, m))
 
     # Present Value of a series of cash-flows
     def present_value(self, probs, age, spot_rates, capital):
@@ -373,19 +459,9 @@ class CommutationFunctions(MortalityTable):
         '''
         if len(spot_rates) != len(capital):
             return np.nan
-        probs_ = None
-        if probs is None:
-            if age is None:
-                return np.nan
-            else:
-                probs_ = [self.npx(age, n + 1) for n in range(len(capital))]
-
-        if isinstance(probs, (float, int)):
-            probs_ = [probs] * len(capital)
-        discount = 1 + np.array(spot_rates) / 100.
-        discount = np.cumprod(1 / discount)
-
-        return sum([p * capital[idx_p] * discount[idx_p] for idx_p, p in enumerate(probs_)])
+        if probs is None and age is None:
+            return np.nan
+        return self.present_value_array(probs, age, spot_rates, [capital])[0]
 
 
     ### Life Insurances
@@ -407,9 +483,10 @@ class CommutationFunctions(MortalityTable):
             return 1
         if x + n > self.w:
             return 0.
-        D_x = self.__Dx[x]
-        D_x_n = self.__Dx[x + n]
-        self.msn.append(f"{n}_E_{x}={D_x_n} / {D_x}")
+        D_x = self.Dx[x]
+        D_x_n = self.Dx[x + n]
+        if self.msn_on:
+            self.msn.append(f"{n}_E_{x}={D_x_n} / {D_x}")
         # note: nEx discounts the growth rate np.power(1 + self.__g, defer + 1) so only survival is considered
         return D_x_n / D_x / np.power(1 + self.__g, n)
 
@@ -428,12 +505,13 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x > self.w:
             return self.__v  # it will die before year's end, because already attained age>w
-        D_x = self.__Dx[x]
+        D_x = self.Dx[x]
         if self.__app_cont:
-            M_x = self.__Mx[x] / self.__cont
+            M_x = self.Mx[x] / self.__cont
         else:
-            M_x = self.__Mx[x]
-        self.msn.append(f"A_{x}={M_x} / {D_x}")
+            M_x = self.Mx[x]
+        if self.msn_on:
+            self.msn.append(f"A_{x}={M_x} / {D_x}")
         return M_x / D_x / (1 + self.__g)
 
     def Ax_(self, x):
@@ -448,12 +526,13 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x > self.w:  # it will die before year's end, because already attained age>w
             return self.__v ** .5
-        D_x = self.__Dx[x]
+        D_x = self.Dx[x]
         if self.__app_cont:
-            M_x = self.__Mx[x]
+            M_x = self.Mx[x]
         else:
-            M_x = self.__Mx[x] * self.__cont
-        self.msn.append(f"A_{x}_={M_x} / {D_x}")
+            M_x = self.Mx[x] * self.__cont
+        if self.msn_on:
+            self.msn.append(f"A_{x}_={M_x} / {D_x}")
         return M_x / D_x / (1 + self.__g)
 
     # Deferred Whole Life Insurances
@@ -467,7 +546,8 @@ class CommutationFunctions(MortalityTable):
         end of the year of death.
         """
         aux = self.nEx(x, defer) * self.Ax(x + defer)
-        self.msn.append(f"{defer}|_A_{x}={defer}_E_{x}*A_{x + defer}")
+        if self.msn_on:
+            self.msn.append(f"{defer}|_A_{x}={defer}_E_{x}*A_{x + defer}")
         return aux
 
     def t_Ax_(self, x, defer=0):
@@ -479,7 +559,8 @@ class CommutationFunctions(MortalityTable):
         :return: net single premium of a deferred whole life insurance that pays 1, at the moment of death.
         """
         aux = self.nEx(x, defer) * self.Ax_(x + defer)
-        self.msn.append(f"{defer}|_A_{x}_={defer}_E_{x}*A_{x + defer}_")
+        if self.msn_on:
+            self.msn.append(f"{defer}|_A_{x}_={defer}_E_{x}*A_{x + defer}_")
         return aux
 
     ## Term Life Insurance
@@ -499,14 +580,15 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x + n > self.w:
             return self.Ax(x)
-        D_x = self.__Dx[x]
+        D_x = self.Dx[x]
         if self.__app_cont:
-            M_x = self.__Mx[x] / self.__cont
-            M_x_n = self.__Mx[x + n] / self.__cont
+            M_x = self.Mx[x] / self.__cont
+            M_x_n = self.Mx[x + n] / self.__cont
         else:
-            M_x = self.__Mx[x]
-            M_x_n = self.__Mx[x + n]
-        self.msn.append(f"{n}_A_{x}=({M_x}-{M_x_n}) / {D_x}")
+            M_x = self.Mx[x]
+            M_x_n = self.Mx[x + n]
+        if self.msn_on:
+            self.msn.append(f"{n}_A_{x}=({M_x}-{M_x_n}) / {D_x}")
         return (M_x - M_x_n) / D_x / (1 + self.__g)
 
     def nAx_(self, x, n):
@@ -524,14 +606,15 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x + n > self.w:
             return self.Ax(x) * self.__cont
-        D_x = self.__Dx[x]
+        D_x = self.Dx[x]
         if self.__app_cont:
-            M_x = self.__Mx[x]
-            M_x_n = self.__Mx[x + n]
+            M_x = self.Mx[x]
+            M_x_n = self.Mx[x + n]
         else:
-            M_x = self.__Mx[x] * self.__cont
-            M_x_n = self.__Mx[x + n] * self.__cont
-        self.msn.append(f"{n}_A_{x}_=({M_x}-{M_x_n}) / {D_x}")
+            M_x = self.Mx[x] * self.__cont
+            M_x_n = self.Mx[x + n] * self.__cont
+        if self.msn_on:
+            self.msn.append(f"{n}_A_{x}_=({M_x}-{M_x_n}) / {D_x}")
         return (M_x - M_x_n) / D_x / (1 + self.__g)
 
     # Deferred Term Life Insurances
@@ -548,7 +631,8 @@ class CommutationFunctions(MortalityTable):
         :return: net single premium of a Deferred Term Life Insurance that pays 1 in the end of the year of death
         """
         aux = self.nEx(x, defer) * self.nAx(x + defer, n)
-        self.msn.append(f"{defer}|{n}_A_{x}={defer}_E_{x}*{n}_A_{x + defer}")
+        if self.msn_on:
+            self.msn.append(f"{defer}|{n}_A_{x}={defer}_E_{x}*{n}_A_{x + defer}")
         return aux
 
     def t_nAx_(self, x, n, defer=0):
@@ -563,7 +647,8 @@ class CommutationFunctions(MortalityTable):
         :return: net single premium of a Deferred Term Life Insurance that pays 1 in the moment of death
         """
         aux = self.nEx(x, defer) * self.nAx_(x + defer, n)
-        self.msn.append(f"{defer}|{n}_A_{x}_={defer}_E_{x}*{n}_A_{x + defer}_")
+        if self.msn_on:
+            self.msn.append(f"{defer}|{n}_A_{x}_={defer}_E_{x}*{n}_A_{x + defer}_")
         return aux
 
     ## Endowment Insurance
@@ -578,7 +663,8 @@ class CommutationFunctions(MortalityTable):
 
         :return: net single premium of an Endowment Insurance. Death coverage is paid at the end of the year of death
         """
-        self.msn.append(f"{n}_AE_{x}={n}_A_{x}+{n}_E_{x}")
+        if self.msn_on:
+            self.msn.append(f"{n}_AE_{x}={n}_A_{x}+{n}_E_{x}")
         return self.nAx(x, n) + self.nEx(x, n)
 
     def nAEx_(self, x, n):
@@ -592,7 +678,8 @@ class CommutationFunctions(MortalityTable):
         :return: net single premium of an Endowment Insurance. Death coverage is paid at the moment of death
         """
         aux = self.nAx_(x, n) + self.nEx(x, n)
-        self.msn.append(f"{n}_AE_{x}_={n}_A_{x}_+{n}_E_{x}")
+        if self.msn_on:
+            self.msn.append(f"{n}_AE_{x}_={n}_A_{x}_+{n}_E_{x}")
         return aux
 
     # Deferred Endowment Insurance
@@ -609,7 +696,8 @@ class CommutationFunctions(MortalityTable):
         :return: net single premium of a Deferred Endowment Insurance. Death coverage is paid at the end of the year of death
         """
         aux = self.nEx(x, defer) * self.nAEx(x + defer, n)
-        self.msn.append(f"{defer}|{n}_AE_{x}={defer}_E_{x}*{n}_AE_{x + defer}")
+        if self.msn_on:
+            self.msn.append(f"{defer}|{n}_AE_{x}={defer}_E_{x}*{n}_AE_{x + defer}")
         return aux
 
     def t_nAEx_(self, x, n, defer=0):
@@ -624,7 +712,8 @@ class CommutationFunctions(MortalityTable):
         :return: net single premium of a Deferred Endowment Insurance. Death coverage is paid at the moment of death
         """
         aux = self.nEx(x, defer) * self.nAEx_(x + defer, n)
-        self.msn.append(f"{defer}|{n}_AE_{x}={defer}_E_{x}*{n}_AE_{x + defer}_")
+        if self.msn_on:
+            self.msn.append(f"{defer}|{n}_AE_{x}={defer}_E_{x}*{n}_AE_{x + defer}_")
         return aux
 
     ## Term Life Insurance with Variable Capitals
@@ -643,12 +732,13 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x > self.w:
             return self.__v  # it will die before year's end, because already attained age>w
-        D_x = self.__Dx[x]
+        D_x = self.Dx[x]
         if self.__app_cont:
-            R_x = self.__Rx[x] / self.__cont
+            R_x = self.Rx[x] / self.__cont
         else:
-            R_x = self.__Rx[x]
-        self.msn.append(f"A_{x}={R_x} / {D_x}")
+            R_x = self.Rx[x]
+        if self.msn_on:
+            self.msn.append(f"A_{x}={R_x} / {D_x}")
         return R_x / D_x
 
     def IAx_(self, x):
@@ -665,12 +755,13 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x > self.w:
             return self.__v ** 0.5 # it will die before year's end, because already attained age>w
-        D_x = self.__Dx[x]
+        D_x = self.Dx[x]
         if self.__app_cont:
-            R_x = self.__Rx[x]
+            R_x = self.Rx[x]
         else:
-            R_x = self.__Rx[x] * self.__cont
-        self.msn.append(f"A_{x}={R_x} / {D_x}")
+            R_x = self.Rx[x] * self.__cont
+        if self.msn_on:
+            self.msn.append(f"A_{x}={R_x} / {D_x}")
         return R_x / D_x
 
     def nIAx(self, x, n):
@@ -689,16 +780,17 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x > self.w:
             return self.__v  # it will die before year's end, because already attained age>w
-        D_x = self.__Dx[x]
+        D_x = self.Dx[x]
         if self.__app_cont:
-            M_x_n = self.__Mx[x + n] / self.__cont
-            R_x = self.__Rx[x] / self.__cont
-            R_x_n = self.__Rx[x + n] / self.__cont
+            M_x_n = self.Mx[x + n] / self.__cont
+            R_x = self.Rx[x] / self.__cont
+            R_x_n = self.Rx[x + n] / self.__cont
         else:
-            M_x_n = self.__Mx[x + n]
-            R_x = self.__Rx[x]
-            R_x_n = self.__Rx[x + n]
-        self.msn.append(f"A_{x}=({R_x}-{R_x_n}-{n}x{M_x_n} / {D_x}")
+            M_x_n = self.Mx[x + n]
+            R_x = self.Rx[x]
+            R_x_n = self.Rx[x + n]
+        if self.msn_on:
+            self.msn.append(f"A_{x}=({R_x}-{R_x_n}-{n}x{M_x_n} / {D_x}")
         return (R_x - R_x_n - n * M_x_n) / D_x
 
     def nIAx_(self, x, n):
@@ -717,16 +809,17 @@ class CommutationFunctions(MortalityTable):
             return np.nan
         if x > self.w:
             return self.__v ** 0.5 # it will die before year's end, because already attained age>w
-        D_x = self.__Dx[x]
+        D_x = self.Dx[x]
         if self.__app_cont:
-            M_x_n = self.__Mx[x + n]
-            R_x = self.__Rx[x]
-            R_x_n = self.__Rx[x + n]
+            M_x_n = self.Mx[x + n]
+            R_x = self.Rx[x]
+            R_x_n = self.Rx[x + n]
         else:
-            M_x_n = self.__Mx[x + n] * self.__cont
-            R_x = self.__Rx[x] * self.__cont
-            R_x_n = self.__Rx[x + n] * self.__cont
-        self.msn.append(f"A_{x}=({R_x}-{R_x_n}-{n}x{M_x_n} / {D_x}")
+            M_x_n = self.Mx[x + n] * self.__cont
+            R_x = self.Rx[x] * self.__cont
+            R_x_n = self.Rx[x + n] * self.__cont
+        if self.msn_on:
+            self.msn.append(f"A_{x}=({R_x}-{R_x_n}-{n}x{M_x_n} / {D_x}")
         return (R_x - R_x_n - n * M_x_n) / D_x
 
     ## Variable Capitals increasing/decreasing arithmetically
@@ -750,11 +843,16 @@ class CommutationFunctions(MortalityTable):
         if first_amount + (n - 1) * increase_amount < 0:
             return np.nan
 
+        if x < 0:
+            return np.nan
+
         term1 = first_amount * self.t_nAx(x=x, n=n, defer=defer)
-        list_increases = [increase_amount * self.t_nAx(x=x + defer, n=n - j, defer=defer + j)
-                          for j in range(1, n)]
+        if self.__g != 0:
+            list_increases = [increase_amount * self.t_nAx(x=x, n=n - j, defer=defer + j)
+                              for j in range(1, n)]
+            return term1 + sum(list_increases)
 
-        return term1 + sum(list_increases)
+        return term1 + increase_amount * float(self.__sum_t_nAx(x, x + defer, n, moment=False))
 
 
     def nIArx_(self, x, n, defer=0, first_amount=1, increase_amount=1):
@@ -776,15 +874,557 @@ class CommutationFunctions(MortalityTable):
         if first_amount + (n - 1) * increase_amount < 0:
             return np.nan
 
+        if x < 0:
+            return np.nan
+
         term1 = first_amount * self.t_nAx_(x=x, n=n, defer=defer)
-        list_increases = [increase_amount * self.t_nAx_(x=x + defer, n=n - j, defer=defer + j)
-                          for j in range(1, n)]
+        if self.__g != 0:
+            list_increases = [increase_amount * self.t_nAx_(x=x, n=n - j, defer=defer + j)
+                              for j in range(1, n)]
+            return term1 + sum(list_increases)
+
+        return term1 + increase_amount * float(self.__sum_t_nAx(x, x + defer, n, moment=True))
+
+
+
+
+
+
+
+
+    ### Batch Evaluation over Arrays
+
+    # The functions below are the array counterparts of the functions above. They accept NumPy arrays (or scalars)
+    # of ages, terms, deferment periods and frequencies, broadcast them against each other, and return an array of
+    # Expected Present Values (EPV). The early returns of the scalar functions are expressed as masks. They do not
+    # append the formulas to msn.
+
+    def __at(self, col, idx):
+        '''
+        Reads a commutation column for an array of ages, returning zero for ages beyond w.
+
+        :param col: the commutation column (Dx, Nx, Mx, ...)
+        :param idx: array of integer ages
+        :return: array with the values of the column at the ages idx
+        '''
+        return np.where(idx > self.w, 0., col[np.clip(idx, 0, self.w)])
+
+    def __Dx_at(self, x):
+        return self.Dx[np.clip(x, 0, self.w)]
+
+    def __death_factor(self, moment):
+        '''
+        Factor to apply to Cx, Mx and Rx so that death benefits are paid at the end of the year of death
+        (moment=False) or at the moment of death (moment=True), taking app_cont into account.
+        '''
+        if self.__app_cont == moment:
+            return 1.
+        if moment:
+            return self.__cont
+        return 1 / self.__cont
+
+    @staticmethod
+    def __broadcast(*args):
+        return np.broadcast_arrays(*[np.asarray(a) for a in args])
+
+    ## Life Annuities
+
+    def ax_array(self, x, m=1):
+        """
+        Array version of ax: immediate whole life annuities of 1 per year, payable m times per year.
+
+        :param x: array of ages at the beginning of the contract
+        :param m: number of payments per year
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        """
+        x, m = self.__broadcast(x, m)
+        aux = self.__at(self.Nx, x + 1) / self.__Dx_at(x) / (1 + self.__g) + (m - 1) / (m * 2)
+        aux = np.where(x >= self.w, 0., aux)
+        aux = np.where(m < 0, np.nan, aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def aax_array(self, x, m=1):
+        """
+        Array version of aax: due whole life annuities of 1 per year, payable m times per year.
+
+        :param x: array of ages at the beginning of the contract
+        :param m: number of payments per year
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        """
+        x, m = self.__broadcast(x, m)
+        aux = self.__at(self.Nx, x) / self.__Dx_at(x) - (m - 1) / (m * 2)
+        aux = np.where(x > self.w, 1., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def t_ax_array(self, x, m=1, defer=0):
+        """
+        Array version of t_ax: immediate whole life annuities deferred defer years.
+
+        :param x: array of ages at the beginning of the contract
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        """
+        x, m, defer = self.__broadcast(x, m, defer)
+        return self.ax_array(x + defer, m) * self.nEx_array(x, defer)
+
+    def t_aax_array(self, x, m=1, defer=0):
+        """
+        Array version of t_aax: due whole life annuities deferred defer years.
+
+        :param x: array of ages at the beginning of the contract
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        """
+        x, m, defer = self.__broadcast(x, m, defer)
+        return self.aax_array(x + defer, m) * self.nEx_array(x, defer)
+
+    def nax_array(self, x, n, m=1):
+        """
+        Array version of nax: immediate n-year temporary life annuities, payable m times per year.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param m: number of payments per year
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        """
+        x, n, m = self.__broadcast(x, n, m)
+        aux = (self.__at(self.Nx, x + 1) - self.__at(self.Nx, x + 1 + n)) / self.__Dx_at(x) / (1 + self.__g) + \
+              (m - 1) / (m * 2) * (1 - self.nEx_array(x, n))
+        aux = np.where(x + 1 + n <= self.w, aux, self.ax_array(x, m))
+        aux = np.where(n < 0, 0., aux)
+        aux = np.where((x < 0) | (m < 0), np.nan, aux)
+        return np.where(x >= self.w, 0., aux)
+
+    def naax_array(self, x, n, m=1):
+        """
+        Array version of naax: due n-year temporary life annuities, payable m times per year.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param m: number of payments per year
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        """
+        x, n, m = self.__broadcast(x, n, m)
+        aux = (self.__at(self.Nx, x) - self.__at(self.Nx, x + n)) / self.__Dx_at(x) - \
+              (m - 1) / (m * 2) * (1 - self.nEx_array(x, n))
+        aux = np.where(x + n <= self.w, aux, self.aax_array(x, m))
+        aux = np.where(n < 0, 0., aux)
+        aux = np.where((x < 0) | (m < 0), np.nan, aux)
+        return np.where((x >= self.w) | (n == 1), 1., aux)
+
+    def t_nax_array(self, x, n, m=1, defer=0):
+        """
+        Array version of t_nax: immediate n-year temporary life annuities, deferred defer years.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        """
+        x, n, m, defer = self.__broadcast(x, n, m, defer)
+        aux = np.where(x + 1 + n + defer <= self.w, self.nax_array(x + defer, n, m), self.ax_array(x + defer, m))
+        return aux * self.nEx_array(x, defer)
+
+    def t_naax_array(self, x, n, m=1, defer=0):
+        """
+        Array version of t_naax: due n-year temporary life annuities, deferred defer years.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        """
+        x, n, m, defer = self.__broadcast(x, n, m, defer)
+        aux = np.where(x + n + defer <= self.w, self.naax_array(x + defer, n, m), self.aax_array(x + defer, m))
+        return aux * self.nEx_array(x, defer)
+
+    ## Life Insurances
+
+    def nEx_array(self, x, n):
+        """
+        Array version of nEx: pure endowments of 1 paid at ages x+n.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of years until payment, if x is alive
+
+        :return: array of actuarial present values
+        """
+        x, n = self.__broadcast(x, n)
+        aux = self.__at(self.Dx, x + n) / self.__Dx_at(x) / np.power(1 + self.__g, n)
+        aux = np.where(x + n > self.w, 0., aux)
+        aux = np.where(n <= 0, 1., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def __Ax_array(self, x, moment):
+        x = np.asarray(x)
+        M_x = self.Mx[np.clip(x, 0, self.w)] * self.__death_factor(moment)
+        aux = M_x / self.__Dx_at(x) / (1 + self.__g)
+        aux = np.where(x > self.w, self.__v ** .5 if moment else self.__v, aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def Ax_array(self, x):
+        """
+        Array version of Ax: whole life insurances that pay 1 at the end of the year of death.
+
+        :param x: array of ages at the beginning of the contract
 
-        return term1 + sum(list_increases)
+        :return: array of net single premiums
+        """
+        return self.__Ax_array(x, moment=False)
+
+    def Ax__array(self, x):
+        """
+        Array version of Ax_: whole life insurances that pay 1 at the moment of death.
+
+        :param x: array of ages at the beginning of the contract
+
+        :return: array of net single premiums
+        """
+        return self.__Ax_array(x, moment=True)
+
+    def t_Ax_array(self, x, defer=0):
+        """
+        Array version of t_Ax: deferred whole life insurances that pay 1 at the end of the year of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param defer: array of deferment periods
+
+        :return: array of net single premiums
+        """
+        x, defer = self.__broadcast(x, defer)
+        return self.nEx_array(x, defer) * self.Ax_array(x + defer)
+
+    def t_Ax__array(self, x, defer=0):
+        """
+        Array version of t_Ax_: deferred whole life insurances that pay 1 at the moment of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param defer: array of deferment periods
+
+        :return: array of net single premiums
+        """
+        x, defer = self.__broadcast(x, defer)
+        return self.nEx_array(x, defer) * self.Ax__array(x + defer)
+
+    def __nAx_array(self, x, n, moment):
+        x, n = self.__broadcast(x, n)
+        factor = self.__death_factor(moment)
+        M_x = self.Mx[np.clip(x, 0, self.w)] * factor
+        M_x_n = self.__at(self.Mx, x + n) * factor
+        aux = (M_x - M_x_n) / self.__Dx_at(x) / (1 + self.__g)
+        # as in nAx_, terms beyond w use Ax times cont
+        aux = np.where(x + n > self.w, self.Ax_array(x) * (self.__cont if moment else 1.), aux)
+        return np.where((x < 0) | (n < 0), np.nan, aux)
+
+    def nAx_array(self, x, n):
+        """
+        Array version of nAx: term life insurances that pay 1 at the end of the year of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of periods of the contracts
+
+        :return: array of net single premiums
+        """
+        return self.__nAx_array(x, n, moment=False)
+
+    def nAx__array(self, x, n):
+        """
+        Array version of nAx_: term life insurances that pay 1 at the moment of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of periods of the contracts
+
+        :return: array of net single premiums
+        """
+        return self.__nAx_array(x, n, moment=True)
+
+    def t_nAx_array(self, x, n, defer=0):
+        """
+        Array version of t_nAx: deferred term life insurances that pay 1 at the end of the year of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param defer: array of deferment periods
+
+        :return: array of net single premiums
+        """
+        x, n, defer = self.__broadcast(x, n, defer)
+        return self.nEx_array(x, defer) * self.nAx_array(x + defer, n)
+
+    def t_nAx__array(self, x, n, defer=0):
+        """
+        Array version of t_nAx_: deferred term life insurances that pay 1 at the moment of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param defer: array of deferment periods
+
+        :return: array of net single premiums
+        """
+        x, n, defer = self.__broadcast(x, n, defer)
+        return self.nEx_array(x, defer) * self.nAx__array(x + defer, n)
+
+    def nAEx_array(self, x, n):
+        """
+        Array version of nAEx: endowment insurances, with death coverage paid at the end of the year of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of periods of the contracts
+
+        :return: array of net single premiums
+        """
+        return self.nAx_array(x, n) + self.nEx_array(x, n)
+
+    def nAEx__array(self, x, n):
+        """
+        Array version of nAEx_: endowment insurances, with death coverage paid at the moment of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of periods of the contracts
+
+        :return: array of net single premiums
+        """
+        return self.nAx__array(x, n) + self.nEx_array(x, n)
+
+    def t_nAEx_array(self, x, n, defer=0):
+        """
+        Array version of t_nAEx: deferred endowment insurances, with death coverage paid at the end of the year of
+        death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of periods of the contracts
+        :param defer: array of deferment periods
+
+        :return: array of net single premiums
+        """
+        x, n, defer = self.__broadcast(x, n, defer)
+        return self.nEx_array(x, defer) * self.nAEx_array(x + defer, n)
+
+    def t_nAEx__array(self, x, n, defer=0):
+        """
+        Array version of t_nAEx_: deferred endowment insurances, with death coverage paid at the moment of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of periods of the contracts
+        :param defer: array of deferment periods
+
+        :return: array of net single premiums
+        """
+        x, n, defer = self.__broadcast(x, n, defer)
+        return self.nEx_array(x, defer) * self.nAEx__array(x + defer, n)
 
+    def __IAx_array(self, x, moment):
+        x = np.asarray(x)
+        R_x = self.Rx[np.clip(x, 0, self.w)] * self.__death_factor(moment)
+        aux = R_x / self.__Dx_at(x)
+        aux = np.where(x > self.w, self.__v ** .5 if moment else self.__v, aux)
+        return np.where(x < 0, np.nan, aux)
 
+    def IAx_array(self, x):
+        """
+        Array version of IAx: whole life insurances that pay 1+k at the end of the year of death.
+
+        :param x: array of ages at the beginning of the contract
+
+        :return: array of net single premiums
+        """
+        return self.__IAx_array(x, moment=False)
+
+    def IAx__array(self, x):
+        """
+        Array version of IAx_: whole life insurances that pay 1+k at the moment of death.
+
+        :param x: array of ages at the beginning of the contract
+
+        :return: array of net single premiums
+        """
+        return self.__IAx_array(x, moment=True)
+
+    def __nIAx_array(self, x, n, moment):
+        x, n = self.__broadcast(x, n)
+        factor = self.__death_factor(moment)
+        M_x_n = self.__at(self.Mx, x + n) * factor
+        R_x = self.Rx[np.clip(x, 0, self.w)] * factor
+        R_x_n = self.__at(self.Rx, x + n) * factor
+        aux = (R_x - R_x_n - n * M_x_n) / self.__Dx_at(x)
+        aux = np.where(x > self.w, self.__v ** .5 if moment else self.__v, aux)
+        return np.where((x < 0) | (n < 0), np.nan, aux)
+
+    def nIAx_array(self, x, n):
+        """
+        Array version of nIAx: term life insurances that pay 1+k at the end of the year of death, k=0,...,n-1.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of periods of the contracts
+
+        :return: array of net single premiums
+        """
+        return self.__nIAx_array(x, n, moment=False)
+
+    def nIAx__array(self, x, n):
+        """
+        Array version of nIAx_: term life insurances that pay 1+k at the moment of death, k=0,...,n-1.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of periods of the contracts
+
+        :return: array of net single premiums
+        """
+        return self.__nIAx_array(x, n, moment=True)
+
+    ## Life Annuities and Insurances with Variable Capitals
+
+    def __variable_capitals(self, sum_increases, term1, x, n, first_amount, increase_amount, zero=False):
+        '''
+        Adds the increases to the first term of an annuity or insurance with capitals evolving in arithmetic
+        progression. sum_increases(j) gives the j-th increase, for j=1,...,n-1, and is only used when g is not 0.
+        The elements where zero is True are set to 0.
+        '''
+        if self.__g != 0:
+            increases = np.zeros(np.shape(x))
+            for j in range(1, int(np.max(n, initial=0))):
+                increases = increases + np.where(j < n, sum_increases(j), 0.)
+        else:
+            increases = sum_increases(None)
+        aux = first_amount * term1 + increase_amount * increases
+        aux = np.where(zero, 0., aux)
+        aux = np.where(x < 0, np.nan, aux)
+        return np.where(first_amount + (n - 1) * increase_amount < 0, np.nan, aux)
 
+    def t_nIax_array(self, x, n, m=1, defer=0, first_amount=1, increase_amount=1):
+        '''
+        Array version of t_nIax: immediate n-year temporary life annuities, deferred defer years, with payments
+        evolving in arithmetic progression.
 
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+        :param first_amount: array of amounts of the first payment
+        :param increase_amount: array of increase amounts
 
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        x, n, m, defer, first_amount, increase_amount = \
+            self.__broadcast(x, n, m, defer, first_amount, increase_amount)
+
+        def sum_increases(j):
+            if j is None:
+                return self.__sum_t_nax(x, x + defer, n, m)
+            return self.t_nax_array(x, n - j, m, defer + j)
 
+        return self.__variable_capitals(sum_increases, self.t_nax_array(x, n, m, defer), x, n, first_amount,
+                                        increase_amount, zero=(x + n + defer > self.w) | (n <= 0))
 
+    def t_nIaax_array(self, x, n, m=1, defer=0, first_amount=1, increase_amount=1):
+        '''
+        Array version of t_nIaax: due n-year temporary life annuities, deferred defer years, with payments evolving in
+        arithmetic progression.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+        :param first_amount: array of amounts of the first payment
+        :param increase_amount: array of increase amounts
+
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        x, n, m, defer, first_amount, increase_amount = \
+            self.__broadcast(x, n, m, defer, first_amount, increase_amount)
+
+        def sum_increases(j):
+            if j is None:
+                return self.__sum_t_nax(x, x + defer - 1, n, m)
+            return self.t_nax_array(x, n - j, m, defer + j - 1)
+
+        return self.__variable_capitals(sum_increases, self.t_naax_array(x, n, m, defer), x, n, first_amount,
+                                        increase_amount, zero=(x + n + defer > self.w) | (n <= 0))
+
+    def nIArx_array(self, x, n, defer=0, first_amount=1, increase_amount=1):
+        '''
+        Array version of nIArx: term life insurances, deferred defer years, that pay (first_amount + k*increase_amount)
+        at the end of the year of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param defer: array of deferment periods
+        :param first_amount: array of insured amounts in the first year
+        :param increase_amount: array of rates of increasing (or decreasing, if negative)
+
+        :return: array of net single premiums
+        '''
+        x, n, defer, first_amount, increase_amount = self.__broadcast(x, n, defer, first_amount, increase_amount)
+
+        def sum_increases(j):
+            if j is None:
+                return self.__sum_t_nAx(x, x + defer, n, moment=False)
+            return self.t_nAx_array(x, n - j, defer + j)
+
+        return self.__variable_capitals(sum_increases, self.t_nAx_array(x, n, defer), x, n, first_amount,
+                                        increase_amount)
+
+    def nIArx__array(self, x, n, defer=0, first_amount=1, increase_amount=1):
+        '''
+        Array version of nIArx_: term life insurances, deferred defer years, that pay
+        (first_amount + k*increase_amount) at the moment of death.
+
+        :param x: array of ages at the beginning of the contract
+        :param n: array of numbers of years of the contracts
+        :param defer: array of deferment periods
+        :param first_amount: array of insured amounts in the first year
+        :param increase_amount: array of rates of increasing (or decreasing, if negative)
+
+        :return: array of net single premiums
+        '''
+        x, n, defer, first_amount, increase_amount = self.__broadcast(x, n, defer, first_amount, increase_amount)
+
+        def sum_increases(j):
+            if j is None:
+                return self.__sum_t_nAx(x, x + defer, n, moment=True)
+            return self.t_nAx__array(x, n - j, defer + j)
+
+        return self.__variable_capitals(sum_increases, self.t_nAx__array(x, n, defer), x, n, first_amount,
+                                        increase_amount)
+
+    ## Cash-Flows
+
+    def present_value_array(self, probs, ages, spot_rates, capitals):
+        '''
+        Array version of present_value: computes the expected present values of many cash-flows at once, one for each
+        row of capitals, through a single matrix-vector product. Payments are considered at the end of the period.
+
+        :param probs: matrix (cash-flows x periods) of probabilities, or an array or value broadcastable to it.
+        For using the instantiated actuarial table, introduce probs=None, to use the matrix of the tpx for the ages
+        :param ages: array of ages at the beginning of the contracts, one for each cash-flow, or a single age
+        :param spot_rates: vector of interest rates for the considered time periods, or a matrix (cash-flows x periods)
+        :param capitals: matrix of cash-flow amounts, cash-flows x periods
+
+        :return: array with the expected present value of each cash-flow
+        '''
+        capitals = np.atleast_2d(np.asarray(capitals, dtype=float))
+        spot_rates = np.asarray(spot_rates, dtype=float)
+        if spot_rates.ndim == 0 or spot_rates.shape[-1] != capitals.shape[1]:
+            return np.full(capitals.shape[0], np.nan)
+        if probs is None:
+            if ages is None:
+                return np.full(capitals.shape[0], np.nan)
+            ages = np.broadcast_to(np.ravel(ages), capitals.shape[:1])
+            probs = self.tpx_matrix(ages, capitals.shape[1])
+        discount = np.cumprod(1 / (1 + spot_rates / 100.), axis=-1)
+        flows = capitals * probs
+        if discount.ndim == 1:
+            return flows @ discount
+        return np.einsum('ij,ij->i', flows, np.broadcast_to(discount, flows.shape))
@@ -0,0 +1,177 @@
+__author__ = "PedroCR"
+
+import sys
+
+import numpy as np
+
+
+class CompactMortalityTable:
+    '''
+    Compact and read-only version of MortalityTable, to keep thousands of tables in memory.
+    The instances have no __dict__ (they use __slots__) and cannot be changed after they are built. lx and qx are kept
+    in one contiguous structured array, of w+2 rows (qx is 0 in the last row); the secondary columns px, dx and ex
+    are derived on first access and kept, in float32 if secondary_dtype is float32. Neither the original table (mt)
+    nor the formulas (msn) are kept.
+
+    :param data_type: Should be "l" for lx, "p" for px and "q" for qx.
+    :param mt: The mortality table, in array format, according to the data_type defined.
+    :param perc: The percentage of qx to use, e.g., you should use 50 for 50%.
+    :param last_q: The value for qw.
+    :param secondary_dtype: The dtype of px, dx and ex: np.float64 or np.float32.
+    '''
+
+    __slots__ = ('__data', '__x0', '__w', '__perc', '__secondary_dtype', '__secondary')
+
+    def __init__(self, data_type='q', mt=None, perc=100, last_q=1, secondary_dtype=np.float64):
+        if data_type not in ('l', 'q', 'p') or not mt:
+            return
+        pperc = perc / 100.
+        x0 = int(mt[0])
+        mt = np.array(mt[1:], dtype=float)
+        if data_type == 'l':
+            if mt[-1] > 0:
+                mt = np.append(mt, 0)
+            qx = (mt[:-1] - mt[1:]) / mt[:-1] * pperc
+        elif data_type == 'q':
+            qx = mt * pperc
+        else:
+            qx = (1 - mt) * pperc
+        if last_q == 1 and qx[-1] < 1 - .1e-10:
+            qx = np.append(qx, 1)
+        if last_q == 0 and qx[-1] > .1e-10:
+            qx = np.append(qx, 0)
+        qx = np.append(np.zeros(x0), qx)
+
+        data = np.zeros(len(qx) + 1, dtype=[('lx', np.float64), ('qx', np.float64)])
+        data['qx'][:-1] = qx
+        data['lx'] = 100000. * np.cumprod(np.append(1., 1 - qx))
+        data.flags.writeable = False
+        object.__setattr__(self, '_CompactMortalityTable__data', data)
+        object.__setattr__(self, '_CompactMortalityTable__x0', x0)
+        object.__setattr__(self, '_CompactMortalityTable__w', len(qx) - 1)
+        object.__setattr__(self, '_CompactMortalityTable__perc', perc)
+        object.__setattr__(self, '_CompactMortalityTable__secondary_dtype', np.dtype(secondary_dtype))
+        object.__setattr__(self, '_CompactMortalityTable__secondary', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is read-only")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.x0, self.w, self.perc, self.secondary_dtype.name}"
+
+    @classmethod
+    def from_table(cls, mt, secondary_dtype=np.float64):
+        '''
+        Builds the compact version of a MortalityTable (or CommutationFunctions), from its qx.
+        '''
+        return cls(data_type='q', mt=[mt.x0] + list(mt.qx[mt.x0:]), last_q=mt.qx[-1],
+                   secondary_dtype=secondary_dtype)
+
+    # getters and setters
+    @property
+    def x0(self):
+        return self.__x0
+
+    @property
+    def w(self):
+        return self.__w
+
+    @property
+    def perc(self):
+        return self.__perc
+
+    @property
+    def secondary_dtype(self):
+        return self.__secondary_dtype
+
+    @property
+    def data(self):
+        return self.__data
+
+    @property
+    def lx(self):
+        return self.__data['lx']
+
+    @property
+    def qx(self):
+        return self.__data['qx'][:-1]
+
+    def __derived(self, name):
+        '''
+        Derives a secondary column on first access and keeps it, read-only.
+        '''
+        col = self.__secondary.get(name)
+        if col is None:
+            lx, qx = self.lx, self.qx
+            if name == 'px':
+                col = 1 - qx
+            elif name == 'dx':
+                col = lx[:-1] * qx
+            else:
+                # sum_lx[x] = lx[x] + lx[x+1] + ..., obtained as a reverse cumulative sum
+                sum_lx = np.cumsum(lx[::-1])[::-1][:len(qx)]
+                col = np.append(sum_lx[1:] / lx[:-2], 0) + .5
+            col = col.astype(self.__secondary_dtype)
+            col.flags.writeable = False
+            self.__secondary[name] = col
+        return col
+
+    @property
+    def px(self):
+        return self.__derived('px')
+
+    @property
+    def dx(self):
+        return self.__derived('dx')
+
+    @property
+    def ex(self):
+        return self.__derived('ex')
+
+    def nbytes(self):
+        '''
+        Memory footprint of the table, in bytes.
+
+        :return: dictionary with the bytes of the structured array, of the secondary columns derived so far, of the
+        Python objects (the instance and its attributes) and the total
+        '''
+        data = self.__data.nbytes
+        secondary = sum(col.nbytes for col in self.__secondary.values())
+        objects = sys.getsizeof(self) + sys.getsizeof(self.__secondary) + \
+            sys.getsizeof(self.__data) - data + sum(sys.getsizeof(col) - col.nbytes for col in self.__secondary.values())
+        return {'data': data, 'secondary': secondary, 'objects': objects, 'total': data + secondary + objects}
+
+    ### Survival Probabilities Functions
+
+    def npx_array(self, x, n=1):
+        '''
+        Probabilities that lives x reach ages x+n, for arrays of integer x and n, as in MortalityTable.npx_array.
+
+        :param x: array of ages at beginning
+        :param n: array of periods
+        :return: array of probabilities of x surviving beyond age x+n
+        '''
+        x, n = np.broadcast_arrays(np.asarray(x), np.asarray(n))
+        lx = self.lx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = lx[np.clip(x + n, 0, self.w + 1)] / lx[np.clip(x, 0, self.w + 1)]
+        aux = np.where(x + n > self.w, 1 - self.qx[-1], aux)
+        aux = np.where(n <= 0, 1., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def nqx_array(self, x, n=1):
+        '''
+        Probabilities that lives x die before x+n, for arrays of integer x and n, as in MortalityTable.nqx_array.
+        '''
+        return 1 - self.npx_array(x, n)
+
+    def to_mortality_table(self, msn_mode='off'):
+        '''
+        Builds the full MortalityTable (with all the functions) from the compact table.
+        '''
+        from lifeactuary.mortality_table import MortalityTable
+        return MortalityTable(data_type='q', mt=[self.x0] + list(self.qx[self.x0:]), last_q=self.qx[-1],
+                              msn_mode=msn_mode)
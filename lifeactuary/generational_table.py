@@ -0,0 +1,172 @@
+__author__ = "PedroCR"
+
+import numpy as np
+from lifeactuary.mortality_table import MortalityTable
+from lifeactuary.commutation_cache import CommutationCache
+
+
+class GenerationalTable:
+    '''
+    Generational (cohort) mortality tables, obtained by projecting a static base table with mortality improvement
+    rates: q(x, Y) = q(x, base_year) * (1-IR(x, base_year+1)) * ... * (1-IR(x, Y)), for the calendar year Y.
+    The improvement rates may be a scale by age (1-D array, the same for every year) or a matrix ages x years, like the
+    MP scales. Ages and years outside the matrix use the nearest row and column, that is, the first or last age and
+    the first or ultimate year of the scale. The last qx of the table (the closing 1) is not improved.
+    The qx of each cohort (year of birth) are computed once, for all the ages at once, and kept; the
+    CommutationFunctions of each cohort and basis are kept in a CommutationCache, so they are not rebuilt per policy.
+
+    :param mt: the base mortality table, in array format, according to the data_type defined
+    :param base_year: the calendar year of the base table
+    :param improvement: improvement rates, a 1-D array by age or a 2-D array ages x years
+    :param first_age: the age of the first row of the improvement rates
+    :param first_year: the calendar year of the first column of the improvement rates (2-D only). By default,
+    base_year+1
+    :param data_type: Use 'l' for lx, 'p' for px and 'q' for qx.
+    :param perc: The percentage of qx of the base table to use, e.g., use 50 for 50%
+    :param cache_size: maximum number of CommutationFunctions kept in the cache
+    '''
+
+    def __init__(self, mt=None, base_year=None, improvement=None, first_age=0, first_year=None, data_type='q',
+                 perc=100, cache_size=256):
+        if base_year is None or improvement is None:
+            return
+        self.__base_table = MortalityTable(data_type=data_type, mt=mt, perc=perc, msn_mode='off')
+        self.__base_year = int(base_year)
+        self.__improvement = np.asarray(improvement, dtype=float)
+        if self.__improvement.ndim == 1:
+            self.__improvement = self.__improvement[:, np.newaxis]
+        self.__first_age = int(first_age)
+        self.__first_year = self.__base_year + 1 if first_year is None else int(first_year)
+        self.__cohorts = {}
+        self.__cache = CommutationCache(max_size=cache_size)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.base_year, self.improvement.shape, self.first_age, self.first_year}"
+
+    # getters and setters
+    @property
+    def base_table(self):
+        return self.__base_table
+
+    @property
+    def base_year(self):
+        return self.__base_year
+
+    @property
+    def improvement(self):
+        return self.__improvement
+
+    @property
+    def first_age(self):
+        return self.__first_age
+
+    @property
+    def first_year(self):
+        return self.__first_year
+
+    @property
+    def w(self):
+        return self.__base_table.w
+
+    @property
+    def cache(self):
+        return self.__cache
+
+    def __improvement_rates(self, years):
+        '''
+        Improvement rates for the ages 0, ..., w and the calendar years given.
+
+        :return: matrix ages x years
+        '''
+        rows = np.clip(np.arange(self.w + 1) - self.__first_age, 0, self.__improvement.shape[0] - 1)
+        columns = np.clip(years - self.__first_year, 0, self.__improvement.shape[1] - 1)
+        return self.__improvement[rows[:, np.newaxis], columns[np.newaxis, :]]
+
+    def projected_qx(self, years):
+        '''
+        Projects the qx of the base table to a calendar year for each age.
+
+        :param years: array with the calendar year of each age 0, ..., w, or a single year
+        :return: array with the projected qx, for the ages 0, ..., w
+        '''
+        ages = np.arange(self.w + 1)
+        years = np.broadcast_to(np.asarray(years, dtype=int), ages.shape)
+        low = min(years.min(), self.__base_year)
+        high = max(years.max(), self.__base_year)
+        # cumulative sums of log(1-IR) over the years low+1, ..., high, for each age
+        log_factors = np.log1p(-self.__improvement_rates(np.arange(low + 1, high + 1)))
+        cumulative = np.hstack([np.zeros((len(ages), 1)), np.cumsum(log_factors, axis=1)])
+        factors = np.exp(cumulative[ages, years - low] - cumulative[ages, self.__base_year - low])
+        qx = np.minimum(self.__base_table.qx * factors, 1.)
+        qx[-1] = self.__base_table.qx[-1]
+        return qx
+
+    def period_qx(self, year):
+        '''
+        Period table for a calendar year, in the format of MortalityTable: the first value is the first age of the
+        base table.
+
+        :param year: the calendar year
+        :return: list with the first age followed by the qx
+        '''
+        x0 = self.__base_table.x0
+        return [x0] + self.projected_qx(year)[x0:].tolist()
+
+    def cohort_qx(self, birth_year):
+        '''
+        Cohort table of the lives born in birth_year, that is, with q(x, birth_year+x) at each age x, in the format of
+        MortalityTable. It is computed once for each cohort.
+
+        :param birth_year: the year of birth
+        :return: list with the first age followed by the qx
+        '''
+        birth_year = int(birth_year)
+        qx = self.__cohorts.get(birth_year)
+        if qx is None:
+            x0 = self.__base_table.x0
+            qx = [x0] + self.projected_qx(birth_year + np.arange(self.w + 1))[x0:].tolist()
+            self.__cohorts[birth_year] = qx
+        return qx
+
+    def mortality_table(self, birth_year, msn_mode='off'):
+        '''
+        MortalityTable of the cohort born in birth_year.
+        '''
+        return MortalityTable(mt=self.cohort_qx(birth_year), msn_mode=msn_mode)
+
+    def commutation_functions(self, birth_year, i, g=0, app_cont=False):
+        '''
+        CommutationFunctions of the cohort born in birth_year, from the cache (read-only, see CommutationCache).
+
+        :param birth_year: the year of birth
+        :param i: interest rate, in percentage. Use 5 for 5%
+        :param g: rate of growing (in percentage), for capitals evolving geometrically
+        :param app_cont: Use 'True' for continuous approach or 'False' for death payments at the end of the year
+        :return: a read-only CommutationFunctions instance
+        '''
+        return self.__cache.get(i=i, g=g, data_type='q', mt=self.cohort_qx(birth_year), app_cont=app_cont)
+
+    def evaluate(self, function, x, valuation_year, i, g=0, app_cont=False, **kwargs):
+        '''
+        Evaluates an array function of CommutationFunctions for policies of different cohorts: the policies are
+        grouped by year of birth (valuation_year-x) and the function is called once for each cohort.
+
+        :param function: the name of the array function of CommutationFunctions, e.g., 'aax_array'
+        :param x: array of ages at valuation_year
+        :param valuation_year: the calendar year of the valuation, a single year or an array like x
+        :param i: interest rate, in percentage. Use 5 for 5%
+        :param g: rate of growing (in percentage), for capitals evolving geometrically
+        :param app_cont: Use 'True' for continuous approach or 'False' for death payments at the end of the year
+        :param kwargs: the other arguments of the function, single values or arrays like x
+        :return: array with the values of the function
+        '''
+        arrays = np.broadcast_arrays(np.asarray(x), np.asarray(valuation_year),
+                                     *[np.asarray(v) for v in kwargs.values()])
+        x, valuation_year, values = arrays[0], arrays[1], arrays[2:]
+        birth_years = valuation_year - x
+        result = np.full(x.shape, np.nan)
+        for birth_year in np.unique(birth_years):
+            idx = birth_years == birth_year
+            cf = self.commutation_functions(birth_year, i, g, app_cont)
+            result[idx] = getattr(cf, function)(x[idx], **{k: v[idx] for k, v in zip(kwargs, values)})
+        return result
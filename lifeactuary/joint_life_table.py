@@ -0,0 +1,509 @@
+__author__ = "PedroCR"
+
+import numpy as np
+from lifeactuary.commutation_table import CommutationFunctions
+
+
+class JointLifeTable:
+    '''
+    Commutation functions for the joint life status (x, y), that fails at the first death of two independent lives,
+    x following the mortality table mt_x and y the mortality table mt_y.
+    The columns lxy, Dxy, Nxy, Cxy and Mxy are precomputed as 2-D arrays, indexed by the age difference d=y-x and by
+    the age x, so each factor is an O(1) lookup and every function accepts arrays of ages (and of the other
+    parameters). The difference d goes from -(w_x+1) to w_y+1, or from -max_difference to max_difference, to keep the
+    memory bounded; the factors of pairs of ages with a larger difference are nan. The columns are discounted with
+    v^x, that is, by the age of the first life.
+
+    :param i: interest rate, in percentage. Use 5 for 5%
+    :param data_type: Use 'l' for lx, 'p' for px and 'q' for qx.
+    :param mt_x: the mortality table of the first life, in array format, according to the data_type defined
+    :param mt_y: the mortality table of the second life, in array format, according to the data_type defined
+    :param perc_x: The percentage of qx to use for the first life, e.g., use 50 for 50%
+    :param perc_y: The percentage of qx to use for the second life, e.g., use 50 for 50%
+    :param app_cont: Use 'True' for continuous approach or 'False' for death payments at the end of the year
+    :param max_difference: maximum age difference |y-x| kept in the columns. Use None for all the differences
+    '''
+
+    def __init__(self, i=None, data_type='q', mt_x=None, mt_y=None, perc_x=100, perc_y=100, app_cont=False,
+                 max_difference=None):
+        if i is None or not mt_x or not mt_y:
+            return
+        self.__cf_x = CommutationFunctions(i=i, data_type=data_type, mt=mt_x, perc=perc_x, app_cont=app_cont,
+                                           msn_mode='off')
+        self.__cf_y = CommutationFunctions(i=i, data_type=data_type, mt=mt_y, perc=perc_y, app_cont=app_cont,
+                                           msn_mode='off')
+        self.__i = i / 100.
+        self.__v = 1 / (1 + self.__i)
+        self.__app_cont = app_cont
+        self.__cont = np.sqrt(1 + self.__i)
+        self.__max_difference = max_difference
+        w_x, w_y = self.__cf_x.w, self.__cf_y.w
+        self.__d_min = -(w_x + 1)
+        self.__d_max = w_y + 1
+        if max_difference is not None:
+            self.__d_min = max(self.__d_min, -max_difference)
+            self.__d_max = min(self.__d_max, max_difference)
+
+        # row k is the diagonal y=x+d, for d=d_min+k, and column j the age x=j, from 0 to w_x+1
+        ages = np.arange(w_x + 2)
+        y = ages[np.newaxis, :] + np.arange(self.__d_min, self.__d_max + 1)[:, np.newaxis]
+        l_y = np.where((y < 0) | (y > w_y + 1), 0., self.__cf_y.lx[np.clip(y, 0, w_y + 1)])
+        self.__lxy = self.__cf_x.lx[np.newaxis, :] * l_y
+        self.__Dxy = self.__lxy * np.power(self.__v, ages)
+        self.__Nxy = np.cumsum(self.__Dxy[:, ::-1], axis=1)[:, ::-1]
+        self.__Cxy = (self.__lxy[:, :-1] - self.__lxy[:, 1:]) * np.power(self.__v, ages[1:])
+        self.__Cxy = np.append(self.__Cxy, np.zeros((len(self.__Cxy), 1)), axis=1)
+        self.__Mxy = np.cumsum(self.__Cxy[:, ::-1], axis=1)[:, ::-1]
+        if self.__app_cont:
+            self.__Cxy = self.__Cxy * self.__cont
+            self.__Mxy = self.__Mxy * self.__cont
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.i, self.cf_x.mt, self.cf_y.mt, self.app_cont, self.max_difference}"
+
+    # getters and setters
+    @property
+    def i(self):
+        return self.__i * 100
+
+    @property
+    def v(self):
+        return self.__v
+
+    @property
+    def app_cont(self):
+        return self.__app_cont
+
+    @property
+    def cont(self):
+        return self.__cont
+
+    @property
+    def max_difference(self):
+        return self.__max_difference
+
+    @property
+    def cf_x(self):
+        return self.__cf_x
+
+    @property
+    def cf_y(self):
+        return self.__cf_y
+
+    @property
+    def differences(self):
+        return np.arange(self.__d_min, self.__d_max + 1)
+
+    @property
+    def lxy(self):
+        return self.__lxy
+
+    @property
+    def Dxy(self):
+        return self.__Dxy
+
+    @property
+    def Nxy(self):
+        return self.__Nxy
+
+    @property
+    def Cxy(self):
+        return self.__Cxy
+
+    @property
+    def Mxy(self):
+        return self.__Mxy
+
+    def __at(self, col, x, y):
+        '''
+        Reads a column for arrays of pairs of ages (x, y): zero if one of the lives is beyond its last age and nan if
+        the age difference is not kept in the columns.
+        '''
+        d = y - x
+        aux = col[np.clip(d - self.__d_min, 0, len(col) - 1), np.clip(x, 0, col.shape[1] - 1)]
+        aux = np.where((x > self.__cf_x.w) | (y > self.__cf_y.w), 0., aux)
+        return np.where((d < self.__d_min) | (d > self.__d_max), np.nan, aux)
+
+    def __death_factor(self, moment):
+        if self.__app_cont == moment:
+            return 1.
+        if moment:
+            return self.__cont
+        return 1 / self.__cont
+
+    @staticmethod
+    def __broadcast(*args):
+        return np.broadcast_arrays(*[np.asarray(a) for a in args])
+
+    ### Survival Probabilities
+
+    def __npxy(self, x, y, n):
+        x, y, n = self.__broadcast(x, y, n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = self.__at(self.__lxy, x + n, y + n) / self.__at(self.__lxy, x, y)
+        aux = np.where(self.__at(self.__lxy, x, y) == 0, 0., aux)
+        aux = np.where(n <= 0, 1., aux)
+        return np.where((x < 0) | (y < 0), np.nan, aux)
+
+    def __nExy(self, x, y, n):
+        return self.__npxy(x, y, n) * np.power(self.__v, n)
+
+    def npxy(self, x, y, n=1):
+        '''
+        Probabilities that the status survives n years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of periods
+        :return: array of probabilities
+        '''
+        return self.__npxy(x, y, n)
+
+    def nqxy(self, x, y, n=1):
+        '''
+        Probabilities that the status fails within n years.
+        '''
+        return 1 - self.npxy(x, y, n)
+
+    ### Life Annuities and Pure Endowments
+
+    def nExy(self, x, y, n):
+        '''
+        Pure endowments of 1, paid at the end of n years if the status is still in force.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of years until payment
+        :return: array of actuarial present values
+        '''
+        return self.__nExy(x, y, n)
+
+    def annuity(self, x, y, n=None, m=1, defer=0, due=False):
+        '''
+        Annuities of 1 per year, payable m times per year while the status is in force, deferred defer years and
+        temporary for n years (or for life, if n is None). The fractional payments use Woolhouse's approximation,
+        as in CommutationFunctions.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the annuities, or None for whole life annuities
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+        :param due: True for payments at the beginning of each period and False at the end
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        whole_life = n is None
+        x, y, n, m, defer = self.__broadcast(x, y, 0 if whole_life else n, m, defer)
+        start = defer + (0 if due else 1)
+        D_xy = self.__at(self.__Dxy, x, y)
+        N_start = self.__at(self.__Nxy, x + start, y + start)
+        N_end = 0. if whole_life else self.__at(self.__Nxy, x + start + n, y + start + n)
+        E_end = 0. if whole_life else self.__nExy(x, y, defer + n)
+        woolhouse = (m - 1) / (m * 2) * (self.__nExy(x, y, defer) - E_end)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = (N_start - N_end) / D_xy + (-woolhouse if due else woolhouse)
+        aux = np.where(D_xy == 0, 0., aux)
+        if not whole_life:
+            aux = np.where(n <= 0, 0., aux)
+        return np.where((x < 0) | (y < 0) | (m < 1), np.nan, aux)
+
+    def axy(self, x, y, m=1):
+        '''
+        Whole life annuities-immediate of 1 per year, payable m times per year at the end of each period while
+        the status is in force.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param m: number of payments per year
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        return self.annuity(x, y, m=m)
+
+    def aaxy(self, x, y, m=1):
+        '''
+        Whole life annuities-due of 1 per year, payable m times per year at the beginning of each period while
+        the status is in force.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param m: number of payments per year
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        return self.annuity(x, y, m=m, due=True)
+
+    def t_axy(self, x, y, m=1, defer=0):
+        '''
+        Whole life annuities-immediate of 1 per year, payable m times per year at the end of each period while
+        the status is in force, deferred defer years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        return self.annuity(x, y, m=m, defer=defer)
+
+    def t_aaxy(self, x, y, m=1, defer=0):
+        '''
+        Whole life annuities-due of 1 per year, payable m times per year at the beginning of each period while
+        the status is in force, deferred defer years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        return self.annuity(x, y, m=m, defer=defer, due=True)
+
+    def naxy(self, x, y, n, m=1):
+        '''
+        Temporary life annuities-immediate of 1 per year, payable m times per year at the end of each period
+        while the status is in force, for at most n years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :param m: number of payments per year
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        return self.annuity(x, y, n, m)
+
+    def naaxy(self, x, y, n, m=1):
+        '''
+        Temporary life annuities-due of 1 per year, payable m times per year at the beginning of each period
+        while the status is in force, for at most n years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :param m: number of payments per year
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        return self.annuity(x, y, n, m, due=True)
+
+    def t_naxy(self, x, y, n, m=1, defer=0):
+        '''
+        Temporary life annuities-immediate of 1 per year, payable m times per year at the end of each period
+        while the status is in force, for at most n years, deferred defer years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        return self.annuity(x, y, n, m, defer)
+
+    def t_naaxy(self, x, y, n, m=1, defer=0):
+        '''
+        Temporary life annuities-due of 1 per year, payable m times per year at the beginning of each period
+        while the status is in force, for at most n years, deferred defer years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :param m: number of payments per year
+        :param defer: array of deferment periods
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        return self.annuity(x, y, n, m, defer, due=True)
+
+    ### Life Insurances
+
+    def insurance(self, x, y, n=None, defer=0, moment=False, endowment=False):
+        '''
+        Insurances of 1, paid at the failure of the status, deferred defer years and temporary for n years (or for
+        life, if n is None).
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of periods of the insurances, or None for whole life insurances
+        :param defer: array of deferment periods
+        :param moment: True for payment at the moment of the failure and False at the end of its year
+        :param endowment: True to add a pure endowment of 1 at the end of the n years (endowment insurance)
+        :return: array of net single premiums
+        '''
+        whole_life = n is None
+        x, y, n, defer = self.__broadcast(x, y, 0 if whole_life else n, defer)
+        D_xy = self.__at(self.__Dxy, x, y)
+        M_start = self.__at(self.__Mxy, x + defer, y + defer)
+        M_end = 0. if whole_life else self.__at(self.__Mxy, x + defer + n, y + defer + n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = (M_start - M_end) * self.__death_factor(moment) / D_xy
+        # the status has already failed, or fails within the year, beyond the last age
+        aux = np.where(D_xy == 0, self.__v ** .5 if moment else self.__v, aux)
+        if not whole_life:
+            aux = np.where(n <= 0, 0., aux)
+            if endowment:
+                aux = aux + self.__nExy(x, y, defer + n)
+        return np.where((x < 0) | (y < 0), np.nan, aux)
+
+    def Axy(self, x, y):
+        '''
+        Whole life insurances that pay 1 at the end of the year of the failure of the status.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y)
+
+    def Axy_(self, x, y):
+        '''
+        Whole life insurances that pay 1 at the moment of the failure of the status.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, moment=True)
+
+    def t_Axy(self, x, y, defer=0):
+        '''
+        Whole life insurances that pay 1 at the end of the year of the failure of the status, if it fails after
+        defer years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param defer: array of deferment periods
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, defer=defer)
+
+    def t_Axy_(self, x, y, defer=0):
+        '''
+        Whole life insurances that pay 1 at the moment of the failure of the status, if it fails after defer
+        years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param defer: array of deferment periods
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, defer=defer, moment=True)
+
+    def nAxy(self, x, y, n):
+        '''
+        Term insurances that pay 1 at the end of the year of the failure of the status, if it fails within n
+        years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, n)
+
+    def nAxy_(self, x, y, n):
+        '''
+        Term insurances that pay 1 at the moment of the failure of the status, if it fails within n years.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, n, moment=True)
+
+    def t_nAxy(self, x, y, n, defer=0):
+        '''
+        Term insurances that pay 1 at the end of the year of the failure of the status, if it fails within the
+        n years that follow the deferment period.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :param defer: array of deferment periods
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, n, defer)
+
+    def t_nAxy_(self, x, y, n, defer=0):
+        '''
+        Term insurances that pay 1 at the moment of the failure of the status, if it fails within the n years
+        that follow the deferment period.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :param defer: array of deferment periods
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, n, defer, moment=True)
+
+    def nAExy(self, x, y, n):
+        '''
+        Endowment insurances that pay 1 at the end of the year of the failure of the status, if it fails within
+        n years, or at the end of the n years, if it is still in force.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, n, endowment=True)
+
+    def nAExy_(self, x, y, n):
+        '''
+        Endowment insurances that pay 1 at the moment of the failure of the status, if it fails within n years,
+        or at the end of the n years, if it is still in force.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of numbers of years of the contract
+        :return: array of Expected Present Values (EPV) of the insurance
+        '''
+        return self.insurance(x, y, n, moment=True, endowment=True)
+
+
+class LastSurvivorTable(JointLifeTable):
+    '''
+    Commutation functions for the last survivor status of two independent lives, that fails at the second death.
+    Each factor is obtained from the single life factors of x and y and from the joint life factor, e.g.
+    a_{xy_bar} = a_x + a_y - a_xy, so it is also an O(1) lookup for arrays of ages.
+    The parameters are the same as for JointLifeTable.
+    '''
+
+    def npxy(self, x, y, n=1):
+        '''
+        Probabilities that the status survives n years, that is, that at least one of the lives survives.
+        '''
+        return self.cf_x.npx_array(x, n) + self.cf_y.npx_array(y, n) - JointLifeTable.npxy(self, x, y, n)
+
+    def nExy(self, x, y, n):
+        '''
+        Pure endowments of 1, paid at the end of n years if at least one of the lives is still alive.
+
+        :param x: array of ages of the first life
+        :param y: array of ages of the second life
+        :param n: array of years until payment
+        :return: array of actuarial present values
+        '''
+        return self.cf_x.nEx_array(x, n) + self.cf_y.nEx_array(y, n) - JointLifeTable.nExy(self, x, y, n)
+
+    def annuity(self, x, y, n=None, m=1, defer=0, due=False):
+        if n is None:
+            single = self.cf_x.t_aax_array if due else self.cf_x.t_ax_array
+            single_y = self.cf_y.t_aax_array if due else self.cf_y.t_ax_array
+            return single(x, m, defer) + single_y(y, m, defer) - JointLifeTable.annuity(self, x, y, n, m, defer, due)
+        single = self.cf_x.t_naax_array if due else self.cf_x.t_nax_array
+        single_y = self.cf_y.t_naax_array if due else self.cf_y.t_nax_array
+        return single(x, n, m, defer) + single_y(y, n, m, defer) - \
+            JointLifeTable.annuity(self, x, y, n, m, defer, due)
+
+    def insurance(self, x, y, n=None, defer=0, moment=False, endowment=False):
+        joint = JointLifeTable.insurance(self, x, y, n, defer, moment, endowment)
+        if n is None:
+            if moment:
+                return self.cf_x.t_Ax__array(x, defer) + self.cf_y.t_Ax__array(y, defer) - joint
+            return self.cf_x.t_Ax_array(x, defer) + self.cf_y.t_Ax_array(y, defer) - joint
+        if endowment:
+            if moment:
+                return self.cf_x.t_nAEx__array(x, n, defer) + self.cf_y.t_nAEx__array(y, n, defer) - joint
+            return self.cf_x.t_nAEx_array(x, n, defer) + self.cf_y.t_nAEx_array(y, n, defer) - joint
+        if moment:
+            return self.cf_x.t_nAx__array(x, n, defer) + self.cf_y.t_nAx__array(y, n, defer) - joint
+        return self.cf_x.t_nAx_array(x, n, defer) + self.cf_y.t_nAx_array(y, n, defer) - joint
@@ -1,7 +1,8 @@
 __author__ = "PedroCR"
 
+from collections import deque
+
 import numpy as np
-import pandas as pd
 
 
 class MortalityTable:
@@ -11,7 +12,7 @@ class MortalityTable:
     The life table will be complete, that is, from age 0 to age w, that is, the last age where lx>0.
     '''
 
-    def __init__(self, data_type='q', mt=None, perc=100, last_q=1):
+    def __init__(self, data_type='q', mt=None, perc=100, last_q=1, msn_mode='full', msn_size=1000, columns=None):
         '''
         Initializes the MortalityTable class so that we can construct a mortality table with the usual fields.
 
@@ -19,6 +20,10 @@ class MortalityTable:
         :param mt: The mortality table, in array format, according to the data_type defined.
         :param perc: The percentage of qx to use, e.g., you should use 50 for 50%.
         :param last_q: The value for qw.
+        :param msn_mode: How the formulas used in the computations are kept in msn: "off", "ring" or "full".
+        :param msn_size: The number of formulas kept when msn_mode is "ring".
+        :param columns: Dictionary with the arrays lx, px, qx, dx and ex already built for this table (e.g., by a
+        TableStore), that are used as they are instead of being computed.
         '''
         if data_type not in ('l', 'q', 'p'):
             return
@@ -27,7 +32,7 @@ class MortalityTable:
         self.__data_type = data_type
         self.__methods = ('udd', 'cfm', 'bal')
         self.__mt = mt
-        self.__x0 = np.int(mt[0])
+        self.__x0 = int(mt[0])
         self.__last_q = last_q
         self.__w = 0
         self.__lx = []
@@ -36,7 +41,18 @@ class MortalityTable:
         self.__dx = []
         self.__ex = []
         self.__perc = perc
+        self.__msn_modes = ('off', 'ring', 'full')
+        self.__msn_mode = 'full'
+        self.__msn_on = True
         self.msn = []
+        self.set_msn_mode(msn_mode, msn_size)
+
+        self.__cum_integral_px = {}
+        if columns is not None:
+            self.__lx, self.__px, self.__qx, self.__dx, self.__ex = \
+                (columns[col] for col in ('lx', 'px', 'qx', 'dx', 'ex'))
+            self.__w = len(self.__lx) - 2
+            return
 
         radical = 100000.
         pperc = perc / 100.
@@ -58,13 +74,10 @@ class MortalityTable:
         self.__qx = np.append(np.zeros(self.x0), self.__qx)
 
         self.__px = 1 - self.__qx
-        self.__lx = np.array([radical] * (len(self.__qx) + 1))
-        self.__dx = np.array([-1] * len(self.__qx))
-        self.__ex = np.array([-1] * len(self.__qx))
-        for idx_p, p in enumerate(self.__px):
-            self.__lx[idx_p + 1] = self.__lx[idx_p] * p
+        self.__lx = radical * np.cumprod(np.append(1., self.__px))
         self.__dx = self.__lx[:-1] * self.__qx
-        sum_lx = np.array([sum(self.__lx[l:]) for l in range(len(self.__qx))])
+        # sum_lx[x] = lx[x] + lx[x+1] + ..., obtained as a reverse cumulative sum
+        sum_lx = np.cumsum(self.__lx[::-1])[::-1][:len(self.__qx)]
         self.__ex = sum_lx[1:] / self.__lx[:-2]
         self.__ex = np.append(self.__ex, 0) + .5
         self.__w = len(self.__lx) - 2
@@ -117,7 +130,37 @@ class MortalityTable:
     def perc(self):
         return self.__perc
 
+    @property
+    def msn_mode(self):
+        return self.__msn_mode
+
+    @property
+    def msn_on(self):
+        return self.__msn_on
+
+    def set_msn_mode(self, msn_mode='full', msn_size=1000):
+        '''
+        Sets how the formulas used in the computations are explained in msn. With "off" nothing is formatted nor kept,
+        which is the choice for production runs; "ring" keeps only the last msn_size formulas; "full" keeps them all.
+        The formulas kept so far are discarded.
+
+        :param msn_mode: "off", "ring" or "full"
+        :param msn_size: the number of formulas kept when msn_mode is "ring"
+        '''
+        if msn_mode not in self.__msn_modes:
+            return
+        if msn_mode == 'ring' and msn_size < 1:
+            return
+        self.__msn_mode = msn_mode
+        self.__msn_on = msn_mode != 'off'
+        if msn_mode == 'ring':
+            self.msn = deque(maxlen=msn_size)
+        else:
+            self.msn = []
+
     def df_life_table(self):
+        # pandas is only imported when a DataFrame is requested, as it takes most of the time to import the package
+        import pandas as pd
         data = {'x': np.arange(self.w + 1), 'lx': self.__lx[:-1], 'dx': self.__dx,
                 'qx': self.__qx, 'px': self.__px, 'exo': self.__ex}
         df = pd.DataFrame(data)
@@ -129,7 +172,7 @@ class MortalityTable:
             return 0.
         if t < 0:
             return np.nan
-        int_t = np.int(t)
+        int_t = int(t)
         frac_t = t - int_t
         if frac_t == 0:
             return self.__lx[int_t]
@@ -141,7 +184,7 @@ class MortalityTable:
             return 0.
         if t < 0:
             return np.nan
-        int_t = np.int(t)
+        int_t = int(t)
         frac_t = t - int_t
         if frac_t == 0:
             return self.__lx[int_t]
@@ -153,7 +196,7 @@ class MortalityTable:
             return 0.
         if t < 0:
             return np.nan
-        int_t = np.int(t)
+        int_t = int(t)
         frac_t = t - int_t
         if frac_t == 0:
             return self.__lx[int_t]
@@ -177,6 +220,54 @@ class MortalityTable:
         else:
             return np.nan
 
+    ## lx for arrays of (fractional) ages
+
+    def __lx_array(self, t, method):
+        '''
+        Interpolates lx for an array of ages, using one of the methods 'udd', 'cfm' or 'bal'.
+
+        :param t: array of ages, that may be non-integer
+        :param method: the method used to approximate lx for non-integer ages
+        :return: array with lx for each age in t, 0 beyond w and nan for negative ages
+        '''
+        t = np.asarray(t, dtype=float)
+        t_ = np.clip(np.nan_to_num(t), 0, self.w)
+        int_t = np.floor(t_).astype(int)
+        frac_t = t_ - int_t
+        l_0 = self.__lx[int_t]
+        l_1 = self.__lx[int_t + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if method == 'udd':
+                l_t = l_0 * (1 - frac_t) + l_1 * frac_t
+            elif method == 'cfm':
+                l_t = l_0 * np.power(l_1 / l_0, frac_t)
+            else:
+                l_t = 1 / (1 / l_0 - frac_t * (1 / l_0 - 1 / l_1))
+        l_t = np.where(frac_t == 0, l_0, l_t)
+        l_t = np.where(t > self.w, 0., l_t)
+        return np.where(t < 0, np.nan, l_t)
+
+    def lx_udd_array(self, t):
+        return self.__lx_array(t, 'udd')
+
+    def lx_cfm_array(self, t):
+        return self.__lx_array(t, 'cfm')
+
+    def lx_bal_array(self, t):
+        return self.__lx_array(t, 'bal')
+
+    def get_lx_method_array(self, x, method='udd'):
+        '''
+        Array version of get_lx_method. Obtains lx for an array of ages, that may be non-integer.
+
+        :param x: array of ages
+        :param method: the method used to approximate lx for non-integer x's: 'udd', 'cfm' or 'bal'
+        :return: array with lx for each age in x
+        '''
+        if method not in self.__methods:
+            return np.full(np.shape(x), np.nan)
+        return self.__lx_array(x, method)
+
 ### Survival Probabilities Functions
 
     def nqx(self, x, n=1, method='udd'):
@@ -198,7 +289,8 @@ class MortalityTable:
             return self.__qx[-1]
         l_x = self.get_lx_method(x, method)
         l_x_t = self.get_lx_method(x + n, method)
-        self.msn.append(f"{n}_q_{x}=1-({l_x_t} / {l_x})")
+        if self.msn_on:
+            self.msn.append(f"{n}_q_{x}=1-({l_x_t} / {l_x})")
         return 1 - l_x_t / l_x
 
     def npx(self, x, n=1, method='udd'):
@@ -220,7 +312,8 @@ class MortalityTable:
             return self.__px[-1]
         l_x = self.get_lx_method(x, method)
         l_x_t = self.get_lx_method(x + n, method)
-        self.msn.append(f"{n}_p_{x}={l_x_t} / {l_x}")
+        if self.msn_on:
+            self.msn.append(f"{n}_p_{x}={l_x_t} / {l_x}")
         return l_x_t / l_x
 
     def t_nqx(self, x, t=1, n=1, method='udd'):
@@ -236,9 +329,79 @@ class MortalityTable:
         l_x = self.get_lx_method(x, method)
         l_x_t = self.get_lx_method(x + t, method)
         l_x_t_n = self.get_lx_method(x + t + n, method)
-        self.msn.append(f"{t}|{n}_q_{x}={t}_p_{x}  {n}_q_{x + t}={l_x_t} / {l_x} ({l_x_t}-{l_x_t_n}) / {l_x_t}")
+        if self.msn_on:
+            self.msn.append(f"{t}|{n}_q_{x}={t}_p_{x}  {n}_q_{x + t}={l_x_t} / {l_x} ({l_x_t}-{l_x_t_n}) / {l_x_t}")
         return (l_x_t - l_x_t_n) / l_x
 
+    ## Survival Probabilities for arrays of ages and periods
+
+    def nqx_array(self, x, n=1, method='udd'):
+        '''
+        Array version of nqx. Obtains the probabilities that lives x die before x+n, for arrays of x and n.
+
+        :param x: array of ages at beginning
+        :param n: array of periods
+        :param method: the method used to approximate lx for non-integer x's
+        :return: array of probabilities of x dying before x+n
+        '''
+        x, n = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(n, dtype=float))
+        if method not in self.__methods:
+            return np.full(x.shape, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = 1 - self.__lx_array(x + n, method) / self.__lx_array(x, method)
+        aux = np.where(x + n > self.w, self.__qx[-1], aux)
+        aux = np.where(n <= 0, 0., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def npx_array(self, x, n=1, method='udd'):
+        '''
+        Array version of npx. Obtains the probabilities that lives x reach ages x+n, for arrays of x and n.
+
+        :param x: array of ages at beginning
+        :param n: array of periods
+        :param method: the method used to approximate lx for non-integer x's
+        :return: array of probabilities of x surviving beyond age x+n
+        '''
+        x, n = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(n, dtype=float))
+        if method not in self.__methods:
+            return np.full(x.shape, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = self.__lx_array(x + n, method) / self.__lx_array(x, method)
+        aux = np.where(x + n > self.w, self.__px[-1], aux)
+        aux = np.where(n <= 0, 1., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def t_nqx_array(self, x, t=1, n=1, method='udd'):
+        '''
+        Array version of t_nqx. Obtains the probabilities that lives x survive to ages x+t and die before x+t+n.
+
+        :param x: array of ages at beginning
+        :param t: array of deferment periods
+        :param n: array of periods
+        :param method: the method used to approximate lx for non-integer x's
+        :return: array of probabilities of x dying after age x+t and before x+t+n
+        '''
+        x, t, n = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(t, dtype=float),
+                                      np.asarray(n, dtype=float))
+        if method not in self.__methods:
+            return np.full(x.shape, np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.__lx_array(x + t, method) - self.__lx_array(x + t + n, method)) / \
+                   self.__lx_array(x, method)
+
+    def tpx_matrix(self, x, n, method='udd'):
+        '''
+        Matrix of survival probabilities tpx, for an array of ages and the durations t=1,...,n.
+
+        :param x: array of ages at beginning
+        :param n: number of durations
+        :param method: the method used to approximate lx for non-integer x's
+        :return: matrix, ages x durations, whose row k has the probabilities that a life x[k] reaches ages x[k]+1, ...,
+        x[k]+n
+        '''
+        x = np.ravel(np.asarray(x, dtype=float))
+        return self.npx_array(x[:, np.newaxis], np.arange(1, n + 1)[np.newaxis, :], method)
+
     def force_qw_0(self):
         '''
         forces the last qx to be equal to zero, to state that there are no more decrements after w
@@ -249,6 +412,7 @@ class MortalityTable:
         self.__px[-1] = 1
         self.__lx[-1] = self.__lx[-2:-1][0]
         self.__dx[-1] = 0
+        self.__cum_integral_px = {}
 
     ### Life Expectancy Functions
 
@@ -273,14 +437,49 @@ class MortalityTable:
         elif method == 'cfm':
             if self.px[x] == 0:
                 return .0
+            if self.qx[x] == 0:
+                return 1.
             return -self.qx[x] / np.log(self.px[x])
         elif method == 'bal':
             if self.px[x] == 0:
                 return .0
+            if self.qx[x] == 0:
+                return 1.
             return -self.px[x] / self.qx[x] * np.log(self.px[x])
         else:
             return np.nan
 
+    def __integral_px_array(self, method):
+        '''
+        Computes get_integral_px_method for all the ages of the table, from 0 to w.
+
+        :method: the chosen method to approximate px: 'udd', 'cfm' or 'bal'
+        :return: array with the integral of tpx in the interval [0,1], for each age
+        '''
+        if method == 'udd':
+            return 1 - .5 * self.__qx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if method == 'cfm':
+                integral = -self.__qx / np.log(self.__px)
+            else:
+                integral = -self.__px / self.__qx * np.log(self.__px)
+        integral = np.where(self.__qx == 0, 1., integral)
+        return np.where(self.__px == 0, 0., integral)
+
+    def __cum_lx_integral_px(self, method):
+        '''
+        Reverse cumulative sums of lx times the integral of tpx in [0,1], computed once for each method. Element k
+        holds the sum for ages k to w, so that the sum for ages a to b-1 is c[a]-c[b]. As for Nx and Mx, the sums are
+        taken from the oldest age, so the sums at old ages, where lx is small, keep their precision.
+
+        :method: the chosen method to approximate px: 'udd', 'cfm' or 'bal'
+        :return: array, with w+2 elements, of the reverse cumulative sums
+        '''
+        if method not in self.__cum_integral_px:
+            lx_integral = self.__lx[:-1] * self.__integral_px_array(method)
+            self.__cum_integral_px[method] = np.append(np.cumsum(lx_integral[::-1])[::-1], 0.)
+        return self.__cum_integral_px[method]
+
     def exn(self, x, n, method='udd'):
         '''
         Computes the approximated life expectancy between two ages.
@@ -316,8 +515,14 @@ class MortalityTable:
             integral1 = 0
 
         complete_years = int(n_max - to_complete_age)
-        integrals = [self.npx(x, to_complete_age + t, method) *
-                     self.get_integral_px_method(next_age + t, method) for t in range(complete_years)]
+        # sum of tpx times the integral of px for the complete years, from the cumulative sums of lx times the integral
+        age_from = min(next_age, self.w + 1)
+        age_to = min(next_age + complete_years, self.w + 1)
+        if age_to > age_from:
+            cum_integral = self.__cum_lx_integral_px(method)
+            integrals = (cum_integral[int(age_from)] - cum_integral[int(age_to)]) / self.get_lx_method(x, method)
+        else:
+            integrals = 0
         final_period = np.round(n_max - to_complete_age - int(n_max - to_complete_age), 6)
 
         if final_period > 0:
@@ -326,4 +531,122 @@ class MortalityTable:
         else:
             integral2 = 0
 
-        return integral1 + sum(integrals) + integral2
\ No newline at end of file
+        return integral1 + integrals + integral2
+
+    def exn_array(self, x, n, method='udd'):
+        '''
+        Array version of exn. Computes the approximated life expectancies between ages x and x+n, for arrays of x and n.
+
+        :param x: array of initial ages
+        :param n: array of periods to be considered
+        :param method: The method used to interpolate: 'udd', 'cfm' or 'bal'.
+        :return: array of the approximated life spans between x and x+n
+        '''
+        x, n = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(n, dtype=float))
+        if method not in self.__methods:
+            return np.full(x.shape, np.nan)
+
+        n_max = np.where(x + n > self.w, self.w - x + 2, n)
+        next_age = np.ceil(x)
+        to_complete_age = np.round(next_age - x, 6)
+
+        integral1 = np.where(to_complete_age > 0, to_complete_age * self.npx_array(x, to_complete_age / 2, method), 0.)
+
+        complete_years = np.trunc(n_max - to_complete_age)
+        age_from = np.nan_to_num(np.clip(next_age, 0, self.w + 1)).astype(int)
+        age_to = np.nan_to_num(np.clip(next_age + complete_years, age_from, self.w + 1)).astype(int)
+        cum_integral = self.__cum_lx_integral_px(method)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            integrals = (cum_integral[age_from] - cum_integral[age_to]) / self.__lx_array(x, method)
+        integrals = np.where(age_to > age_from, integrals, 0.)
+
+        final_period = np.round(n_max - to_complete_age - complete_years, 6)
+        integral2 = self.npx_array(x, complete_years, method) * final_period * \
+                    self.npx_array(next_age + np.trunc(n - to_complete_age), final_period, method)
+        integral2 = np.where(final_period > 0, integral2, 0.)
+
+        aux = integral1 + integrals + integral2
+        aux = np.where(to_complete_age >= n_max, n_max * self.npx_array(x, n_max / 2, method), aux)
+        aux = np.where(n <= 0, 1., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    ### Simulation of Future Lifetimes
+
+    def __simulate(self, x, u, method):
+        '''
+        Inverse-CDF sampling of future lifetimes: finds T such that l(x+T) = u * l(x), using the cumulative lx for the
+        complete years and the method 'udd', 'cfm' or 'bal' within the year of death.
+
+        :param x: array of ages
+        :param u: array of uniform random numbers in (0, 1], with the same shape as x
+        :param method: the method used to approximate lx for non-integer ages
+        :return: array of complete future lifetimes
+        '''
+        l_target = u * self.__lx_array(x, method)
+        # k is the age of death: lx[k] >= l_target > lx[k+1]
+        k = np.searchsorted(-self.__lx, -l_target, side='right') - 1
+        k = np.clip(k, 0, self.w)
+        l_0 = self.__lx[k]
+        l_1 = self.__lx[k + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if method == 'udd':
+                s = (l_0 - l_target) / (l_0 - l_1)
+            elif method == 'cfm':
+                s = np.log(l_target / l_0) / np.log(l_1 / l_0)
+            else:
+                s = (1 / l_target - 1 / l_0) / (1 / l_1 - 1 / l_0)
+        # if there are no deaths in the last age (qw=0), lives reaching w+1 are kept at w+1
+        s = np.clip(np.nan_to_num(s, nan=1.), 0, 1)
+        t = np.maximum(k + s - x, 0.)
+        t = np.where(x > self.w, 0., t)
+        return np.where(x < 0, np.nan, t)
+
+    def iter_simulated_lifetimes(self, x, size=None, method='udd', curtate=False, seed=None, chunk_size=1000000):
+        '''
+        Simulates the future lifetimes of lives aged x, in chunks of at most chunk_size lives, so that the memory used
+        is bounded for very large portfolios. The lifetimes are obtained by inverse-CDF sampling on lx, using the
+        chosen method to interpolate within the year of death.
+
+        :param x: age, or array of ages, of the lives
+        :param size: shape of the simulated lifetimes, to which x is broadcast. Use None for one lifetime for each x
+        :param method: the method used to approximate lx for non-integer ages: 'udd', 'cfm' or 'bal'
+        :param curtate: use True for the curtate future lifetimes (number of complete years lived)
+        :param seed: seed, or numpy Generator, for reproducible simulations
+        :param chunk_size: maximum number of lifetimes in each chunk
+        :return: generator of 1-D arrays with the simulated lifetimes, in the order of the flattened x
+        '''
+        x = np.asarray(x, dtype=float)
+        if size is not None:
+            x = np.broadcast_to(x, size)
+        x = x.reshape(-1)
+        rng = np.random.default_rng(seed)
+        for start in range(0, len(x), chunk_size):
+            x_chunk = x[start:start + chunk_size]
+            if method not in self.__methods:
+                yield np.full(x_chunk.shape, np.nan)
+                continue
+            t = self.__simulate(x_chunk, 1 - rng.random(len(x_chunk)), method)
+            if curtate:
+                t = np.floor(t)
+            yield t
+
+    def simulate_lifetimes(self, x, size=None, method='udd', curtate=False, seed=None, chunk_size=1000000):
+        '''
+        Simulates the future lifetimes of lives aged x. The simulation is done in chunks of at most chunk_size lives,
+        so that the temporary arrays are bounded; see iter_simulated_lifetimes to also bound the result.
+
+        :param x: age, or array of ages, of the lives
+        :param size: shape of the simulated lifetimes, to which x is broadcast. Use None for one lifetime for each x
+        :param method: the method used to approximate lx for non-integer ages: 'udd', 'cfm' or 'bal'
+        :param curtate: use True for the curtate future lifetimes (number of complete years lived)
+        :param seed: seed, or numpy Generator, for reproducible simulations
+        :param chunk_size: maximum number of lifetimes simulated at once
+        :return: array with the simulated lifetimes, with shape size (or the shape of x)
+        '''
+        shape = np.shape(x) if size is None else size
+        t = np.empty(int(np.prod(shape)))
+        start = 0
+        for t_chunk in self.iter_simulated_lifetimes(x, size, method, curtate, seed, chunk_size):
+            t[start:start + len(t_chunk)] = t_chunk
+            start += len(t_chunk)
+        return t.reshape(shape)
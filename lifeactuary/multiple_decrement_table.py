@@ -0,0 +1,332 @@
+__author__ = "PedroCR"
+
+import numpy as np
+
+
+def _udd_integral(q, j):
+    '''
+    Integral, from 0 to 1, of the product of (1 - t q'(k)) for the causes k different from j, where q is a matrix
+    causes x ages of absolute rates. The product is expanded as a polynomial in t, for all the ages at once.
+
+    :return: array with the integral for each age
+    '''
+    others = np.delete(q, j, axis=0)
+    coefficients = np.zeros((len(others) + 1, q.shape[1]))
+    coefficients[0] = 1.
+    for q_k in others:
+        coefficients[1:] = coefficients[1:] - q_k * coefficients[:-1]
+    return np.sum(coefficients / np.arange(1, len(coefficients) + 1)[:, np.newaxis], axis=0)
+
+
+def absolute_to_dependent(q_absolute, method='udd'):
+    '''
+    Converts absolute rates of decrement, q'(j), those of the associated single decrement tables, into dependent
+    rates, q(j), those of the multiple decrement table, for all the causes and ages at once.
+
+    :param q_absolute: matrix causes x ages with the absolute rates
+    :param method: 'udd' for a uniform distribution of each decrement in its associated single decrement table, or
+    'cfm' for a constant force of each decrement in each year of age
+    :return: matrix causes x ages with the dependent rates, or None if the method is not valid
+    '''
+    q = np.atleast_2d(np.asarray(q_absolute, dtype=float))
+    if method == 'udd':
+        return np.array([q[j] * _udd_integral(q, j) for j in range(len(q))])
+    if method == 'cfm':
+        p_total = np.prod(1 - q, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = (1 - p_total) * np.log(1 - q) / np.log(p_total)
+        return np.where(p_total == 1, 0., np.where(p_total == 0, q / np.sum(q, axis=0), aux))
+    return None
+
+
+def dependent_to_absolute(q_dependent, method='udd', tolerance=1e-14, max_iterations=100):
+    '''
+    Converts dependent rates of decrement, q(j), those of the multiple decrement table, into absolute rates, q'(j),
+    those of the associated single decrement tables, for all the causes and ages at once.
+    With 'cfm' the conversion is q'(j) = 1 - p^(q(j)/q), where q is the total rate and p=1-q. With 'udd' it is the
+    inverse of absolute_to_dependent, q'(j) = q(j) / integral of the product of (1 - t q'(k)) for k different from j,
+    solved by fixed-point iterations, that converge in a few steps for usual rates.
+
+    :param q_dependent: matrix causes x ages with the dependent rates
+    :param method: 'udd' for a uniform distribution of each decrement in its associated single decrement table, or
+    'cfm' for a constant force of each decrement in each year of age
+    :param tolerance: maximum change of the rates in the last iteration, for 'udd'
+    :param max_iterations: maximum number of iterations, for 'udd'
+    :return: matrix causes x ages with the absolute rates, or None if the method is not valid
+    '''
+    q_dep = np.atleast_2d(np.asarray(q_dependent, dtype=float))
+    if method == 'udd':
+        q = q_dep.copy()
+        for _ in range(max_iterations):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                q_new = np.array([q_dep[j] / _udd_integral(q, j) for j in range(len(q))])
+            q_new = np.clip(np.nan_to_num(q_new, nan=1.), 0., 1.)
+            change = np.max(np.abs(q_new - q), initial=0.)
+            q = q_new
+            if change < tolerance:
+                break
+        return q
+    if method == 'cfm':
+        q_total = np.sum(q_dep, axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = 1 - np.power(1 - q_total, q_dep / q_total)
+        return np.where(q_total == 0, 0., aux)
+    return None
+
+
+class MultipleDecrementTable:
+    '''
+    Multiple decrement table, for a status (e.g. active members of a pension plan) left by several causes, like death,
+    disability, lapse or retirement.
+    The rates of each cause are given in the format of MortalityTable, that is, the first value is the first age of
+    the rates, and may cover different ages: the rates are 0 outside them. The table ends at the last age of the
+    rates, w; the lives still in the status after w are not assigned to any cause.
+    With an interest rate, the commutation columns Dx and Nx of the status and Cx and Mx of each cause are computed,
+    as 2-D arrays causes x ages, so the expected present values of the benefits of all the causes are obtained in
+    one pass, for arrays of ages.
+
+    :param data: dictionary {cause: rates}, with the rates of each cause in the format of MortalityTable
+    :param rate_type: 'dependent' for rates of the multiple decrement table, q(j), or 'absolute' for rates of the
+    associated single decrement tables, q'(j)
+    :param method: 'udd' or 'cfm', the assumption used to convert between absolute and dependent rates
+    :param i: interest rate, in percentage, for the commutation columns. Use None for no commutation columns
+    :param app_cont: Use 'True' for continuous approach or 'False' for payments at the end of the year of decrement
+    '''
+
+    def __init__(self, data=None, rate_type='dependent', method='udd', i=None, app_cont=False):
+        if not data or rate_type not in ('dependent', 'absolute') or method not in ('udd', 'cfm'):
+            return
+        self.__causes = tuple(data)
+        self.__rate_type = rate_type
+        self.__method = method
+        x0 = [int(rates[0]) for rates in data.values()]
+        self.__w = max(x0[j] + len(rates) - 2 for j, rates in enumerate(data.values()))
+        rates = np.zeros((len(self.__causes), self.__w + 1))
+        for j, cause_rates in enumerate(data.values()):
+            rates[j, x0[j]:x0[j] + len(cause_rates) - 1] = cause_rates[1:]
+        if rate_type == 'dependent':
+            self.__qx = rates
+            self.__qx_absolute = dependent_to_absolute(rates, method)
+        else:
+            self.__qx_absolute = rates
+            self.__qx = absolute_to_dependent(rates, method)
+
+        radical = 100000.
+        self.__qx_total = np.sum(self.__qx, axis=0)
+        self.__px_total = 1 - self.__qx_total
+        self.__lx = radical * np.cumprod(np.append(1., self.__px_total))[:-1]
+        self.__dx = self.__lx * self.__qx
+
+        self.__i = None
+        if i is None:
+            return
+        self.__i = i / 100.
+        self.__v = 1 / (1 + self.__i)
+        self.__app_cont = app_cont
+        self.__cont = np.sqrt(1 + self.__i)
+        ages = np.arange(self.__w + 1)
+        self.__Dx = self.__lx * np.power(self.__v, ages)
+        self.__Nx = np.cumsum(self.__Dx[::-1])[::-1]
+        self.__Cx = self.__dx * np.power(self.__v, ages + 1)
+        if app_cont:
+            self.__Cx = self.__Cx * self.__cont
+        self.__Mx = np.cumsum(self.__Cx[:, ::-1], axis=1)[:, ::-1]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.causes, self.rate_type, self.method, self.i}"
+
+    # getters and setters
+    @property
+    def causes(self):
+        return self.__causes
+
+    @property
+    def rate_type(self):
+        return self.__rate_type
+
+    @property
+    def method(self):
+        return self.__method
+
+    @property
+    def w(self):
+        return self.__w
+
+    @property
+    def qx(self):
+        return self.__qx
+
+    @property
+    def qx_absolute(self):
+        return self.__qx_absolute
+
+    @property
+    def qx_total(self):
+        return self.__qx_total
+
+    @property
+    def px_total(self):
+        return self.__px_total
+
+    @property
+    def lx(self):
+        return self.__lx
+
+    @property
+    def dx(self):
+        return self.__dx
+
+    @property
+    def i(self):
+        return None if self.__i is None else self.__i * 100
+
+    @property
+    def Dx(self):
+        return self.__Dx
+
+    @property
+    def Nx(self):
+        return self.__Nx
+
+    @property
+    def Cx(self):
+        return self.__Cx
+
+    @property
+    def Mx(self):
+        return self.__Mx
+
+    def __at(self, col, x):
+        '''
+        Reads a column, of the status or of all the causes, for an array of ages, returning zero beyond w.
+        '''
+        return np.where(x > self.__w, 0., col[..., np.clip(x, 0, self.__w)])
+
+    def __by_cause(self, col, cause):
+        '''
+        Selects the rows of a column by cause: the row of one cause, the sum of the rows for cause=None (any cause)
+        or all the rows for cause='all'. Returns None for an unknown cause.
+        '''
+        if cause is None:
+            return np.sum(col, axis=0)
+        if cause == 'all':
+            return col
+        if cause not in self.__causes:
+            return None
+        return col[self.__causes.index(cause)]
+
+    def __death_factor(self, moment):
+        if self.__app_cont == moment:
+            return 1.
+        if moment:
+            return self.__cont
+        return 1 / self.__cont
+
+    ### Probabilities
+
+    def npx(self, x, n=1):
+        '''
+        Probabilities that lives x remain in the status for n years.
+
+        :param x: array of ages
+        :param n: array of periods
+        :return: array of probabilities
+        '''
+        x, n = np.broadcast_arrays(np.asarray(x), np.asarray(n))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = self.__at(self.__lx, x + n) / self.__at(self.__lx, x)
+        aux = np.where(x > self.__w, 0., aux)
+        aux = np.where(n <= 0, 1., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def nqx(self, x, n=1, cause=None):
+        '''
+        Probabilities that lives x leave the status by a cause within n years.
+
+        :param x: array of ages
+        :param n: array of periods
+        :param cause: the name of the cause, None for any cause or 'all' for each of the causes (the first axis of the
+        result is then the cause)
+        :return: array of probabilities, or None for an unknown cause
+        '''
+        dx = self.__by_cause(self.__dx, cause)
+        if dx is None:
+            return None
+        x, n = np.broadcast_arrays(np.asarray(x), np.asarray(n))
+        sum_dx = np.cumsum(dx[..., ::-1], axis=-1)[..., ::-1]
+        n = np.maximum(n, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = (self.__at(sum_dx, x) - self.__at(sum_dx, x + n)) / self.__at(self.__lx, x)
+        aux = np.where(x > self.__w, 0., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    ### Actuarial Present Values
+
+    def nEx(self, x, n):
+        '''
+        Pure endowments of 1, paid at ages x+n if the lives are still in the status.
+
+        :param x: array of ages
+        :param n: array of years until payment
+        :return: array of actuarial present values
+        '''
+        return self.npx(x, n) * np.power(self.__v, n)
+
+    def naax(self, x, n=None, m=1):
+        '''
+        Due annuities of 1 per year, payable m times per year while the lives are in the status, temporary for n years
+        (or until they leave the status, if n is None), e.g. for contributions or salaries.
+
+        :param x: array of ages
+        :param n: array of numbers of years, or None for annuities until the end of the table
+        :param m: number of payments per year
+        :return: array of Expected Present Values (EPV) for payments of 1/m
+        '''
+        x, n, m = np.broadcast_arrays(np.asarray(x), np.asarray(self.__w + 1 if n is None else n), np.asarray(m))
+        n = np.maximum(n, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = (self.__at(self.__Nx, x) - self.__at(self.__Nx, x + n)) / self.__at(self.__Dx, x) - \
+                (m - 1) / (m * 2) * (1 - self.nEx(x, n))
+        aux = np.where((x > self.__w) | (n == 0), 0., aux)
+        return np.where((x < 0) | (m < 1), np.nan, aux)
+
+    def nAx(self, x, n=None, cause=None, defer=0, moment=False):
+        '''
+        Insurances of 1, paid when the lives leave the status by a cause, within n years (or at any time, if n is
+        None), after a deferment period.
+
+        :param x: array of ages
+        :param n: array of periods, or None for the whole table
+        :param cause: the name of the cause, None for any cause or 'all' for each of the causes (the first axis of the
+        result is then the cause)
+        :param defer: array of deferment periods
+        :param moment: True for payment at the moment of the decrement and False at the end of its year
+        :return: array of net single premiums, or None for an unknown cause
+        '''
+        Mx = self.__by_cause(self.__Mx, cause)
+        if Mx is None:
+            return None
+        x, n, defer = np.broadcast_arrays(np.asarray(x), np.asarray(self.__w + 1 if n is None else n),
+                                          np.asarray(defer))
+        n = np.maximum(n, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            aux = (self.__at(Mx, x + defer) - self.__at(Mx, x + defer + n)) / self.__at(self.__Dx, x) * \
+                self.__death_factor(moment)
+        aux = np.where(x > self.__w, 0., aux)
+        return np.where(x < 0, np.nan, aux)
+
+    def benefits(self, x, amounts, n=None, defer=0, moment=False):
+        '''
+        Expected present value of the benefits of all the causes in one pass, with an amount for each cause.
+
+        :param x: array of ages
+        :param amounts: dictionary {cause: amount}, where the amounts may be arrays, like x. Causes not in amounts have
+        no benefit
+        :param n: array of periods, or None for the whole table
+        :param defer: array of deferment periods
+        :param moment: True for payment at the moment of the decrement and False at the end of its year
+        :return: array of net single premiums
+        '''
+        epv = self.nAx(x, n, 'all', defer, moment)
+        weights = [np.asarray(amounts.get(cause, 0.), dtype=float) for cause in self.__causes]
+        return np.sum([weight * epv[j] for j, weight in enumerate(weights)], axis=0)
@@ -0,0 +1,199 @@
+__author__ = "PedroCR"
+
+import sys
+
+import numpy as np
+
+
+class PortfolioValuation:
+    '''
+    Values a portfolio of policies in bulk, computing the net single premium (NSP) and the net annual premium of each
+    policy with the array functions of CommutationFunctions, grouped by mortality basis and product.
+    The portfolio is read in chunks of chunk_size policies, so that files with millions of policies are valued in
+    bounded memory. It can be a csv or parquet file, a pandas DataFrame, a numpy structured array (that may be a
+    memory map) or a dictionary of arrays, with the columns:
+        age: age at the beginning of the contract (integer)
+        product: one of PortfolioValuation.products
+        term: number of years of the contract (ignored by the whole life products)
+        defer: deferment period, default 0
+        frequency: number of payments per year of the annuities, default 1
+        benefit: the annual amount of the annuity or the insured capital, default 1
+        premium_term: number of years of payment of annual premiums, at the beginning of each year, where 0 means
+            premiums for the whole life. By default, the deferment period for the annuities (or a single premium if
+            there is no deferment) and the deferment plus the term for the insurances
+        basis: the key of the mortality basis in bases. Not needed if there is only one basis
+
+    :param bases: dictionary with the CommutationFunctions of each mortality basis
+    :param chunk_size: number of policies valued at once
+    '''
+
+    products = ('annuity_due', 'annuity_immediate', 'pure_endowment', 'term_insurance', 'whole_life_insurance',
+                'endowment_insurance')
+
+    def __init__(self, bases, chunk_size=1000000):
+        self.__bases = {str(key): cf for key, cf in bases.items()}
+        self.__chunk_size = chunk_size
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{tuple(self.__bases), self.__chunk_size}"
+
+    # getters and setters
+    @property
+    def bases(self):
+        return self.__bases
+
+    @property
+    def chunk_size(self):
+        return self.__chunk_size
+
+    def value(self, policies):
+        '''
+        Values a set of policies, that fits in memory.
+
+        :param policies: dictionary of arrays, numpy structured array or pandas DataFrame with the policies
+        :return: arrays with the net single premium and the net annual premium of each policy (nan for policies with
+        an unknown product or basis)
+        '''
+        size = len(policies['age'])
+
+        def column(name, default, dtype):
+            if name in column_names(policies):
+                return np.asarray(policies[name]).astype(dtype)
+            return np.full(size, default, dtype=dtype)
+
+        x = column('age', 0, int)
+        n = column('term', 0, int)
+        defer = column('defer', 0, int)
+        m = column('frequency', 1, int)
+        benefit = column('benefit', 1., float)
+        product = column('product', '', str)
+        basis = column('basis', next(iter(self.__bases)) if len(self.__bases) == 1 else '', str)
+        premium_term = column('premium_term', -1, int)
+
+        nsp = np.full(size, np.nan)
+        premium = np.full(size, np.nan)
+        for basis_key in np.unique(basis):
+            cf = self.__bases.get(basis_key)
+            if cf is None:
+                continue
+            in_basis = basis == basis_key
+            for product_key in np.unique(product[in_basis]):
+                idx = np.flatnonzero(in_basis & (product == product_key))
+                factor, default_premium_term = product_factors(cf, product_key, x[idx], n[idx], m[idx], defer[idx])
+                nsp[idx] = benefit[idx] * factor
+                p_term = np.where(premium_term[idx] < 0, default_premium_term, premium_term[idx])
+                annuity = np.where(p_term == 0, cf.aax_array(x[idx]), cf.naax_array(x[idx], p_term))
+                premium[idx] = nsp[idx] / annuity
+        return nsp, premium
+
+    def iter_values(self, portfolio):
+        '''
+        Values the portfolio, chunk by chunk.
+
+        :param portfolio: path of a csv or parquet file, pandas DataFrame, numpy structured array or dictionary of
+        arrays with the policies
+        :return: generator of pandas DataFrames with the columns of each chunk of policies, plus the net single
+        premium (nsp) and the net annual premium (premium)
+        '''
+        import pandas as pd
+        for chunk in iter_chunks(portfolio, self.__chunk_size):
+            nsp, premium = self.value(chunk)
+            df = pd.DataFrame({name: np.asarray(chunk[name]) for name in column_names(chunk)})
+            df['nsp'] = nsp
+            df['premium'] = premium
+            yield df
+
+    def totals(self, portfolio):
+        '''
+        Values the portfolio, chunk by chunk, keeping only the totals by basis and product, so that the memory used
+        does not depend on the size of the portfolio.
+
+        :param portfolio: path of a csv or parquet file, pandas DataFrame, numpy structured array or dictionary of
+        arrays with the policies
+        :return: pandas DataFrame with the number of policies, the number of policies that could not be valued
+        (unknown basis or product, or invalid data) and the sums of the benefits, net single premiums and net annual
+        premiums, by basis and product. The sums of the premiums are nan where some policies could not be valued
+        '''
+        totals = None
+        for df in self.iter_values(portfolio):
+            if 'basis' not in df:
+                df['basis'] = next(iter(self.__bases)) if len(self.__bases) == 1 else ''
+            if 'benefit' not in df:
+                df['benefit'] = 1.
+            df['policies'] = 1
+            df['unvalued'] = (df['nsp'].isna() | df['premium'].isna()).astype(int)
+            chunk_totals = df.groupby(['basis', 'product'])[['policies', 'unvalued', 'benefit', 'nsp', 'premium']].sum()
+            totals = chunk_totals if totals is None else totals.add(chunk_totals, fill_value=0)
+        if totals is not None:
+            # groupby().sum() skips the nan, so the totals would look complete without the policies not valued
+            totals.loc[totals['unvalued'] > 0, ['nsp', 'premium']] = np.nan
+        return totals
+
+
+def product_factors(cf, product, x, n, m, defer):
+    '''
+    Expected present value of a benefit of 1, and the default premium term, for policies of one product.
+
+    :param cf: CommutationFunctions of the mortality basis
+    :param product: one of PortfolioValuation.products
+    :param x: array of ages
+    :param n: array of terms
+    :param m: array of numbers of payments per year of the annuities
+    :param defer: array of deferment periods
+    :return: arrays with the expected present values and the default premium terms (nan for an unknown product)
+    '''
+    if product == 'annuity_due':
+        return cf.t_naax_array(x, n, m, defer), np.maximum(defer, 1)
+    if product == 'annuity_immediate':
+        return cf.t_nax_array(x, n, m, defer), np.maximum(defer, 1)
+    if product == 'pure_endowment':
+        return cf.nEx_array(x, defer + n), defer + n
+    if product == 'term_insurance':
+        return cf.t_nAx_array(x, n, defer), defer + n
+    if product == 'whole_life_insurance':
+        return cf.t_Ax_array(x, defer), np.zeros_like(x)
+    if product == 'endowment_insurance':
+        return cf.t_nAEx_array(x, n, defer), defer + n
+    return np.full(x.shape, np.nan), np.zeros_like(x)
+
+
+def column_names(chunk):
+    '''
+    Names of the columns of a chunk of policies (dictionary of arrays or numpy structured array).
+    '''
+    if isinstance(chunk, np.ndarray):
+        return chunk.dtype.names
+    return list(chunk.keys())
+
+
+def iter_chunks(portfolio, chunk_size):
+    '''
+    Reads a portfolio in chunks of at most chunk_size policies.
+
+    :param portfolio: path of a csv or parquet file, pandas DataFrame, numpy structured array or dictionary of arrays
+    :param chunk_size: maximum number of policies in each chunk
+    :return: generator of chunks (dictionaries of arrays, structured arrays or DataFrames)
+    '''
+    if isinstance(portfolio, str):
+        if portfolio.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(portfolio).iter_batches(batch_size=chunk_size):
+                yield {name: batch.column(name).to_numpy(zero_copy_only=False) for name in batch.schema.names}
+        else:
+            import pandas as pd
+            for df in pd.read_csv(portfolio, chunksize=chunk_size):
+                yield {name: df[name].to_numpy() for name in df.columns}
+        return
+    # a DataFrame can only be given if pandas was imported, so pandas is not imported here for other portfolios
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(portfolio, pd.DataFrame):
+        for start in range(0, len(portfolio), chunk_size):
+            df = portfolio.iloc[start:start + chunk_size]
+            yield {name: df[name].to_numpy() for name in df.columns}
+        return
+    size = len(portfolio) if isinstance(portfolio, np.ndarray) else len(portfolio['age'])
+    for start in range(0, size, chunk_size):
+        if isinstance(portfolio, np.ndarray):
+            yield portfolio[start:start + chunk_size]
+        else:
+            yield {name: np.asarray(values)[start:start + chunk_size] for name, values in portfolio.items()}
@@ -1,27 +1,233 @@
 __author__ = "PedroCR"
 
-from xml.dom import minidom
+import json
+import mmap
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
 
 http_header = 'https://mort.soa.org/ViewTable.aspx?&TableIdentity='
 
+# Binary cache of the parsed tables: the magic bytes, the length of the json header, the json header (with the fields
+# of the table, the modification time and size of the xml file, and the dtype and shape of each array), padded to a
+# multiple of 8 bytes, followed by the arrays.
+cache_suffix = '.cache'
+cache_magic = b'SOATBL02'
+
+
+class SoaSubTable:
+    def __init__(self, description, axes, axis_values, values):
+        '''
+        One of the tables (Table blocks) of a SOA xml file. An aggregate or ultimate table has one axis (the age) and
+        a 1-D array of values; a select table has two axes (the issue age and the duration) and a 2-D array of values,
+        issue age x duration, where the missing values are nan.
+        :param description: The description of the table.
+        :param axes: The names of the axes, e.g. ['Age'] or ['Age', 'Duration'].
+        :param axis_values: List with one array for each axis, with the values of that axis.
+        :param values: Array with the values (usually qx) of the table.
+        '''
+        self.description = description
+        self.axes = axes
+        self.axis_values = axis_values
+        self.values = values
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.axes, self.values.shape}"
+
+    @property
+    def select(self):
+        return self.values.ndim == 2
+
 
 class SoaTable:
-    def __init__(self, table_name):
+    def __init__(self, table_name, cache=False, cache_dir=None):
         '''
         Reads a previously downloaded life table, from Society of Actuaries, in the xml format and prepares
         all the information to create a life (mortality table).
+        All the tables in the file are read into tables. The usual attributes, like table_qx, refer to the first
+        table with one axis (the ultimate table, for select and ultimate files) and are None if there is no such table.
         :param table_name: The SOA table, in xml format, to be read.
+        :param cache: Use True to keep the parsed table in a binary file (with the name of the xml file followed by
+        .cache), that is memory-mapped instead of parsing the xml file while the xml file does not change.
+        :param cache_dir: The folder of the cache file. By default, the folder of the xml file.
         '''
         self.table_name = table_name
-        self.xmldoc = minidom.parse(table_name)
-        self.table_id = self.xmldoc.getElementsByTagName('TableIdentity')[0].childNodes[0].data
+        self.cache_dir = cache_dir
+        data = None
+        if cache:
+            data = self.__read_cache()
+        if data is None:
+            data = self.__parse_xml()
+            if cache:
+                self.__write_cache(data)
+        self.table_id = data['table_id']
         self.url = http_header + self.table_id
-        self.name = self.xmldoc.getElementsByTagName('TableName')[0].childNodes[0].data
-        self.contentType = self.xmldoc.getElementsByTagName('ContentType')[0].childNodes[0].data
-        self.tableReference = self.xmldoc.getElementsByTagName('TableReference')[0].childNodes[0].data
-        self.ages = self.xmldoc.getElementsByTagName('Y')
-        self.min_age = int(self.ages[0].attributes['t'].value)
-        self.max_age = self.min_age + len(self.ages) - 1
-        self.table_qx = [float(age.childNodes[0].data) for age in self.ages]
-        self.table_qx.insert(0, self.min_age)
+        self.name = data['name']
+        self.contentType = data['content_type']
+        self.tableReference = data['table_reference']
+        self.tables = [SoaSubTable(description, axes,
+                                   [data[f"table{k}_axis{j}"] for j in range(len(axes))], data[f"table{k}_values"])
+                       for k, (description, axes) in enumerate(zip(data['descriptions'], data['axes']))]
+        self.select_table = next((table for table in self.tables if table.select), None)
+        self.ultimate_table = next((table for table in self.tables if not table.select), None)
+        self.ages = None
+        self.min_age = None
+        self.max_age = None
+        self.table_qx = None
+        if self.ultimate_table is not None:
+            self.ages = self.ultimate_table.axis_values[0]
+            self.min_age = int(self.ages[0])
+            self.max_age = self.min_age + len(self.ages) - 1
+            self.table_qx = self.ultimate_table.values.tolist()
+            self.table_qx.insert(0, self.min_age)
         # todo: scrap the tables from SOA
+
+    def select_qx(self, issue_age):
+        '''
+        Builds the qx of a life selected at issue_age: the select rates, for each duration, followed by the ultimate
+        rates from the age where the select period ends. The result has the format used by MortalityTable, that is,
+        the first value is the first age (issue_age).
+        :param issue_age: The age at selection.
+        :return: list with issue_age followed by the qx from that age on, or None if there is no select table or the
+        issue age is not in the select table.
+        '''
+        if self.select_table is None:
+            return None
+        issue_ages, durations = self.select_table.axis_values
+        row = np.flatnonzero(issue_ages == issue_age)
+        if len(row) == 0:
+            return None
+        select_rates = self.select_table.values[row[0]]
+        select_rates = select_rates[~np.isnan(select_rates)]
+        qx = [issue_age] + select_rates.tolist()
+        if self.ultimate_table is not None:
+            ultimate_age = issue_age + len(select_rates)
+            ages = self.ultimate_table.axis_values[0]
+            qx += self.ultimate_table.values[ages >= ultimate_age].tolist()
+        return qx
+
+    def __parse_xml(self):
+        '''
+        Parses the xml file with iterparse, clearing each value after reading it, so that the document is never
+        held in memory as a whole. Every Table block is read, with one or two axes.
+        :return: dictionary with the fields of the file and, for each table k, its axes and the arrays
+        table{k}_axis{j} and table{k}_values
+        '''
+        fields = {'TableIdentity': 'table_id', 'TableName': 'name', 'ContentType': 'content_type',
+                  'TableReference': 'table_reference'}
+        data = {'descriptions': [], 'axes': []}
+        table = None
+        row = None
+        for event, elem in ET.iterparse(self.table_name, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == 'Table':
+                    table = {'description': None, 'axes': [], 'cells': []}
+                elif tag == 'Axis' and 't' in elem.attrib:
+                    row = int(elem.attrib['t'])
+                continue
+            if tag == 'Y':
+                table['cells'].append((row, int(elem.attrib['t']), float(elem.text)))
+                elem.clear()
+            elif tag == 'Axis' and 't' in elem.attrib:
+                row = None
+                elem.clear()
+            elif tag == 'AxisDef' and table is not None:
+                table['axes'].append(elem.attrib.get('id'))
+            elif tag == 'TableDescription' and table is not None and table['description'] is None:
+                table['description'] = elem.text
+            elif tag == 'Table':
+                k = len(data['descriptions'])
+                axis_values, values = self.__table_arrays(table['cells'])
+                data['descriptions'].append(table['description'])
+                data['axes'].append(table['axes'][:len(axis_values)])
+                for j, axis in enumerate(axis_values):
+                    data[f"table{k}_axis{j}"] = axis
+                data[f"table{k}_values"] = values
+                table = None
+                elem.clear()
+            elif tag in fields and fields[tag] not in data:
+                data[fields[tag]] = elem.text
+        return data
+
+    @staticmethod
+    def __table_arrays(cells):
+        '''
+        Builds the arrays of a table from its cells (row, column, value). For tables with one axis, the row is None.
+        :return: list with the values of each axis, and the array of values (1-D or 2-D, with nan for missing values)
+        '''
+        rows = [cell[0] for cell in cells]
+        columns = np.array([cell[1] for cell in cells], dtype=int)
+        values = np.array([cell[2] for cell in cells], dtype=float)
+        if all(row is None for row in rows):
+            return [columns], values
+        rows = np.array(rows, dtype=int)
+        row_values = np.unique(rows)
+        column_values = np.unique(columns)
+        table = np.full((len(row_values), len(column_values)), np.nan)
+        table[np.searchsorted(row_values, rows), np.searchsorted(column_values, columns)] = values
+        return [row_values, column_values], table
+
+    def __cache_file(self):
+        if self.cache_dir is None:
+            return self.table_name + cache_suffix
+        return os.path.join(self.cache_dir, os.path.basename(self.table_name) + cache_suffix)
+
+    def __read_cache(self):
+        '''
+        Reads the parsed table from the cache file, if it exists and was written for the current version of the xml
+        file (same modification time and size). The arrays are read from a memory map of the file.
+        :return: dictionary with the fields of the table, or None if the cache is not valid
+        '''
+        try:
+            stat = os.stat(self.table_name)
+            with open(self.__cache_file(), 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if buffer[:8] != cache_magic:
+                return None
+            header_size = int.from_bytes(buffer[8:16], 'little')
+            header = json.loads(buffer[16:16 + header_size])
+            if header['mtime_ns'] != stat.st_mtime_ns or header['size'] != stat.st_size:
+                return None
+            data = header['fields']
+            offset = 16 + header_size
+            for name, dtype, shape in header['arrays']:
+                count = int(np.prod(shape))
+                data[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+                offset += count * np.dtype(dtype).itemsize
+            return data
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def __write_cache(self, data):
+        '''
+        Writes the parsed table to the cache file. The file is written to a temporary file (with a unique name, so
+        that threads and processes do not collide) first and then renamed, so that other processes never read a
+        partial cache. Errors, e.g. a read-only folder, are ignored.
+        '''
+        cache_file = self.__cache_file()
+        tmp_file = None
+        arrays = {name: np.ascontiguousarray(value) for name, value in data.items() if isinstance(value, np.ndarray)}
+        try:
+            stat = os.stat(self.table_name)
+            header = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                      'fields': {name: value for name, value in data.items() if name not in arrays},
+                      'arrays': [[name, value.dtype.str, list(value.shape)] for name, value in arrays.items()]}
+            header = json.dumps(header).encode()
+            header += b' ' * (-len(header) % 8)
+            folder = os.path.dirname(cache_file) or '.'
+            os.makedirs(folder, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=folder, prefix=os.path.basename(cache_file) + '.', suffix='.tmp',
+                                             delete=False) as f:
+                tmp_file = f.name
+                f.write(cache_magic)
+                f.write(len(header).to_bytes(8, 'little'))
+                f.write(header)
+                for value in arrays.values():
+                    f.write(value.tobytes())
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            if tmp_file is not None and os.path.exists(tmp_file):
+                os.remove(tmp_file)
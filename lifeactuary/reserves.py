@@ -0,0 +1,230 @@
+__author__ = "PedroCR"
+
+import numpy as np
+from lifeactuary.portfolio import product_factors, column_names, iter_chunks
+
+
+class ReserveProjection:
+    '''
+    Projects the prospective (net premium) reserves of arrays of policies, for all the durations at once, with the
+    array functions of CommutationFunctions. The policies have the columns used by PortfolioValuation (age, product,
+    term, defer, frequency, benefit and premium_term) and, optionally, premium, the annual premium. Without premium,
+    the net annual premium is used, so the reserve at duration 0 is 0.
+    The reserve at duration t is the expected present value, at age x+t, of the future benefits less the future
+    premiums, just before the premium and the payments of annuities due at t (after the payments of immediate
+    annuities at t), and 0 after the end of the contract.
+
+    :param cf: CommutationFunctions of the mortality basis
+    :param chunk_size: number of policies projected at once, bounding the memory used by the intermediate matrices
+    '''
+
+    def __init__(self, cf, chunk_size=100000):
+        self.__cf = cf
+        self.__chunk_size = chunk_size
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}{self.__cf, self.__chunk_size}"
+
+    # getters and setters
+    @property
+    def cf(self):
+        return self.__cf
+
+    @property
+    def chunk_size(self):
+        return self.__chunk_size
+
+    def __columns(self, policies):
+        '''
+        Reads the columns of the policies, with the default values for the missing ones, and computes the premium
+        term and the annual premium of each policy.
+
+        :return: dictionary of arrays
+        '''
+        size = len(policies['age'])
+        names = column_names(policies)
+
+        def column(name, default, dtype):
+            if name in names:
+                return np.asarray(policies[name]).astype(dtype)
+            return np.full(size, default, dtype=dtype)
+
+        p = {'age': column('age', 0, int), 'term': column('term', 0, int), 'defer': column('defer', 0, int),
+             'frequency': column('frequency', 1, int), 'benefit': column('benefit', 1., float),
+             'product': column('product', '', str), 'premium_term': column('premium_term', -1, int),
+             'premium': column('premium', np.nan, float)}
+        p['end'] = np.where(p['product'] == 'whole_life_insurance', self.__cf.w + 1 - p['age'],
+                            p['defer'] + p['term'])
+        for product_key in np.unique(p['product']):
+            idx = np.flatnonzero(p['product'] == product_key)
+            x = p['age'][idx]
+            factor, default_premium_term = product_factors(self.__cf, product_key, x, p['term'][idx],
+                                                           p['frequency'][idx], p['defer'][idx])
+            p_term = np.where(p['premium_term'][idx] < 0, default_premium_term, p['premium_term'][idx])
+            p['premium_term'][idx] = p_term
+            annuity = np.where(p_term == 0, self.__cf.aax_array(x), self.__cf.naax_array(x, p_term))
+            p['premium'][idx] = np.where(np.isnan(p['premium'][idx]), p['benefit'][idx] * factor / annuity,
+                                         p['premium'][idx])
+        return p
+
+    def horizon(self, policies):
+        '''
+        Number of years of the projection: the longest remaining term of the policies.
+        '''
+        p = self.__columns(policies)
+        return int(np.max(p['end'], initial=0))
+
+    def __project(self, p, horizon):
+        '''
+        Prospective reserves of the policies p (see __columns) for the durations 0, 1, ..., horizon.
+        The paths of the expected present values of a benefit of 1 and of a premium of 1 only depend on the age,
+        product, term, deferment, frequency and premium term, so they are computed once for each distinct profile of
+        policies and then scaled by the benefits and premiums of the policies.
+
+        :return: matrix policies x durations
+        '''
+        cf = self.__cf
+        products, product_code = np.unique(p['product'], return_inverse=True)
+        profiles = np.stack([p['age'], product_code, p['term'], p['defer'], p['frequency'], p['premium_term'],
+                             p['end']], axis=1)
+        profiles, profile_idx = _unique_rows(profiles)
+        x0, code, term, defer0, m, p_term, end = (profiles[:, [j]] for j in range(profiles.shape[1]))
+
+        t = np.arange(horizon + 1)[np.newaxis, :]
+        x = x0 + t
+        defer = np.maximum(defer0 - t, 0)
+        n = np.maximum(term - np.maximum(t - defer0, 0), 0)
+        m = np.broadcast_to(m, x.shape)
+        annuity = np.where(p_term > t, cf.naax_array(x, np.maximum(p_term - t, 0)), 0.)
+        if np.any(p_term == 0):
+            annuity = np.where(p_term == 0, cf.aax_array(x), annuity)
+        benefits = np.zeros(x.shape)
+        for k, product_key in enumerate(products):
+            idx = np.flatnonzero(code[:, 0] == k)
+            benefits[idx], _ = product_factors(cf, product_key, x[idx], n[idx], m[idx], defer[idx])
+        out = (t > end) | (x > cf.w)
+        annuity = np.where(out, 0., annuity)
+        benefits = np.where(out, 0., benefits)
+        return p['benefit'][:, np.newaxis] * benefits[profile_idx] - p['premium'][:, np.newaxis] * annuity[profile_idx]
+
+    def iter_reserves(self, policies, horizon=None):
+        '''
+        Projects the reserves of the policies, chunk by chunk.
+
+        :param policies: pandas DataFrame, numpy structured array or dictionary of arrays with the policies
+        :param horizon: number of years of the projection. By default, the longest remaining term of the policies
+        :return: generator of matrices, policies of the chunk x durations 0, 1, ..., horizon
+        '''
+        if horizon is None:
+            horizon = self.horizon(policies)
+        for chunk in iter_chunks(policies, self.__chunk_size):
+            yield self.__project(self.__columns(chunk), horizon)
+
+    def reserves(self, policies, horizon=None):
+        '''
+        Prospective reserves of the policies, for all the durations.
+
+        :param policies: pandas DataFrame, numpy structured array or dictionary of arrays with the policies
+        :param horizon: number of years of the projection. By default, the longest remaining term of the policies
+        :return: matrix with the reserves, policies x durations 0, 1, ..., horizon
+        '''
+        if horizon is None:
+            horizon = self.horizon(policies)
+        return np.concatenate([np.zeros((0, horizon + 1))] + list(self.iter_reserves(policies, horizon)))
+
+    def total_reserves(self, policies, horizon=None):
+        '''
+        Total reserves of the portfolio for each duration (the run-off of the reserves), computed chunk by chunk, so
+        that the memory used does not depend on the number of policies.
+
+        :param policies: pandas DataFrame, numpy structured array or dictionary of arrays with the policies
+        :param horizon: number of years of the projection. By default, the longest remaining term of the policies
+        :return: array with the total reserves, for the durations 0, 1, ..., horizon
+        '''
+        if horizon is None:
+            horizon = self.horizon(policies)
+        total = np.zeros(horizon + 1)
+        for reserves in self.iter_reserves(policies, horizon):
+            total += reserves.sum(axis=0)
+        return total
+
+    def thiele(self, policies, steps_per_year=12, horizon=None, method='udd'):
+        '''
+        Reserves of the policies by backward recursion on steps of 1/steps_per_year years, a discrete version of
+        Thiele's differential equation: V(t) = P(t) - pi(t) + v(t,t+h) * (h_q_x+t * S(t+h) + h_p_x+t * V(t+h)),
+        where P(t) are the payments to the survivors at t (annuities due and pure endowments), pi(t) the premiums at t
+        and S(t+h) the benefits at t+h (death benefits, paid at the end of the step of death, or payments of
+        immediate annuities to the survivors). Premiums are paid at the beginning of each year and the payments of
+        the annuities at their frequency, at the beginning of the step where they fall.
+        The discount uses the discount_factors of the CommutationFunctions, so it also works for term structures.
+        steps_per_year should be a multiple of the frequencies of the annuities, so that every payment falls at the
+        beginning of a step. With steps_per_year=1 and annual payments (frequency 1), it gives the prospective
+        reserves; with frequency m>1 it does not, as the prospective reserves use the approximation (m-1)/(2m) of the
+        annuities payable m times per year.
+
+        :param policies: pandas DataFrame, numpy structured array or dictionary of arrays with the policies
+        :param steps_per_year: number of steps per year, e.g., 12 for monthly steps
+        :param horizon: number of years of the projection. By default, the longest remaining term of the policies
+        :param method: the method used to approximate lx for non-integer ages: 'udd', 'cfm' or 'bal'
+        :return: matrix with the reserves, policies x times 0, 1/steps_per_year, ..., horizon
+        '''
+        cf = self.__cf
+        p = self.__columns(policies)
+        if horizon is None:
+            horizon = int(np.max(p['end'], initial=0))
+        s = steps_per_year
+        h = 1 / s
+        product, benefit, premium = p['product'], p['benefit'], p['premium']
+        x, m = p['age'], p['frequency']
+        # start and end of the payments or of the cover, in steps
+        start = p['defer'] * s
+        end = (p['defer'] + p['term']) * s
+        death_cover = np.isin(product, ('term_insurance', 'whole_life_insurance', 'endowment_insurance'))
+        end_cover = np.where(product == 'whole_life_insurance', np.iinfo(int).max, end)
+        maturity = np.isin(product, ('pure_endowment', 'endowment_insurance'))
+        annuity_due = product == 'annuity_due'
+        annuity_immediate = product == 'annuity_immediate'
+        p_term = np.where(p['premium_term'] == 0, np.iinfo(int).max // s, p['premium_term'])
+        discount = cf.discount_factors()
+
+        def payments_due(k):
+            # payments at the times defer+j/m, j=0,...,n*m-1, in the step [k*h, (k+1)*h)
+            return -(-np.clip((k + 1) * m - start * m, 0, (end - start) * m) // s) + \
+                (-np.clip(k * m - start * m, 0, (end - start) * m) // s)
+
+        def payments_immediate(k):
+            # payments at the times defer+j/m, j=1,...,n*m, in the step (k*h, (k+1)*h]
+            return np.clip((k + 1) * m - start * m, 0, (end - start) * m) // s - \
+                np.clip(k * m - start * m, 0, (end - start) * m) // s
+
+        steps = horizon * s
+        reserves = np.zeros((len(x), steps + 1))
+        for k in range(steps, -1, -1):
+            value = np.where(annuity_due, payments_due(k) * benefit / m, 0.)
+            value += np.where(maturity & (k == end), benefit, 0.)
+            if k % s == 0:
+                value -= np.where(k // s < p_term, premium, 0.)
+            if k < steps:
+                age = x + k * h
+                p_step = cf.npx_array(age, h, method)
+                year = np.clip(x + k // s, 0, cf.w)
+                v_step = np.power(discount[year + 1] / discount[year], h)
+                death = np.where(death_cover & (k >= start) & (k < end_cover), benefit, 0.)
+                survival = np.where(annuity_immediate, payments_immediate(k) * benefit / m, 0.) + reserves[:, k + 1]
+                value += v_step * ((1 - p_step) * death + p_step * survival)
+            reserves[:, k] = np.where(x + k * h >= cf.w + 1, 0., value)
+        return reserves
+
+
+def _unique_rows(a):
+    '''
+    Same as np.unique(a, axis=0, return_inverse=True), for a matrix of non-negative integers, but faster: each row is
+    encoded as a single integer before sorting.
+    '''
+    low = a.min(axis=0, initial=0)
+    dims = a.max(axis=0, initial=0) - low + 1
+    if np.prod(dims.astype(float)) >= 2 ** 62:
+        rows, inverse = np.unique(a, axis=0, return_inverse=True)
+        return rows, np.ravel(inverse)
+    keys, idx, inverse = np.unique(np.ravel_multi_index((a - low).T, dims), return_index=True, return_inverse=True)
+    return a[idx], inverse
@@ -0,0 +1,92 @@
+__author__ = "PedroCR"
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from lifeactuary.commutation_table import CommutationFunctions
+
+
+def _scenario_factors(mt, scenario, data_type, app_cont, factors):
+    '''
+    Builds the CommutationFunctions of one scenario and evaluates the factors.
+
+    :return: list of rows (i, g, perc, factor, element, value)
+    '''
+    i, g, perc = scenario
+    cf = CommutationFunctions(i=i, g=g, data_type=data_type, mt=mt, perc=perc, app_cont=app_cont, msn_mode='off')
+    rows = []
+    for factor, (method, kwargs) in factors.items():
+        value = getattr(cf, method)(**kwargs)
+        if np.ndim(value) == 0:
+            rows.append((i, g, perc, factor, 0, float(value)))
+        else:
+            rows.extend((i, g, perc, factor, element, v) for element, v in enumerate(np.ravel(value)))
+    return rows
+
+
+def _scenario_factors_shared(shm_name, size, scenarios, data_type, app_cont, factors):
+    '''
+    Same as _scenario_factors, for a batch of scenarios in a worker process: the mortality table is read from the
+    shared memory block shm_name, instead of being pickled for each scenario.
+    '''
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        mt = np.ndarray((size,), dtype=float, buffer=shm.buf).tolist()
+    finally:
+        shm.close()
+    return [row for scenario in scenarios for row in _scenario_factors(mt, scenario, data_type, app_cont, factors)]
+
+
+def scenario_sweep(mt, rates, growths=(0,), percs=(100,), factors=None, data_type='q', app_cont=False,
+                   executor='process', max_workers=None):
+    '''
+    Evaluates actuarial factors for every combination of interest rate, growth rate and percentage of the mortality
+    table, building the CommutationFunctions of each scenario in a pool of processes or threads. With processes, the
+    mortality table is placed once in shared memory and read by the workers, instead of being pickled for each
+    scenario.
+
+    :param mt: the mortality table, in array format, according to the data_type defined
+    :param rates: interest rates, in percentage
+    :param growths: rates of growing, in percentage
+    :param percs: percentages of qx to use
+    :param factors: dictionary {name: (method, kwargs)}, where method is the name of a function of
+        CommutationFunctions, e.g. {'a65': ('aax', {'x': 65, 'm': 12}), 'A40': ('nAx', {'x': 40, 'n': 20})}.
+        The array functions may also be used, giving one row for each element.
+    :param data_type: Use 'l' for lx, 'p' for px and 'q' for qx.
+    :param app_cont: Use 'True' for continuous approach or 'False' for death payments at the end of the year
+    :param executor: 'process' for a process pool, 'thread' for a thread pool or None to run in this process
+    :param max_workers: maximum number of workers of the pool
+    :return: pandas DataFrame with the columns i, g, perc, factor, element and value
+    '''
+    columns = ['i', 'g', 'perc', 'factor', 'element', 'value']
+    factors = factors or {}
+    scenarios = list(itertools.product(rates, growths, percs))
+    mt = list(mt)
+    if executor is None:
+        results = [_scenario_factors(mt, scenario, data_type, app_cont, factors) for scenario in scenarios]
+    elif executor == 'thread':
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(lambda scenario: _scenario_factors(mt, scenario, data_type, app_cont, factors),
+                                    scenarios))
+    elif executor == 'process':
+        mt_array = np.asarray(mt, dtype=float)
+        shm = shared_memory.SharedMemory(create=True, size=mt_array.nbytes)
+        try:
+            np.ndarray(mt_array.shape, dtype=float, buffer=shm.buf)[:] = mt_array
+            # a few batches of scenarios per worker, to keep the communication between processes low
+            batch_size = max(1, -(-len(scenarios) // (4 * (max_workers or os.cpu_count() or 1))))
+            batches = [scenarios[k:k + batch_size] for k in range(0, len(scenarios), batch_size)]
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(_scenario_factors_shared, shm.name, len(mt_array), batch, data_type, app_cont,
+                                       factors) for batch in batches]
+                results = [future.result() for future in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        return None
+    import pandas as pd
+    return pd.DataFrame([row for rows in results for row in rows], columns=columns)
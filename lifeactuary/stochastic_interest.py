@@ -0,0 +1,223 @@
+__author__ = "PedroCR"
+
+import numpy as np
+
+
+class StochasticInterest:
+    '''
+    Monte Carlo simulation of interest rates, to value annuities-certain and life annuities and insurances under
+    stochastic interest. Thousands of paths are simulated at once, as matrices paths x times, and the present values
+    of all the paths are obtained with a matrix-vector product. The paths are simulated in chunks of chunk_size paths,
+    so the memory used does not depend on the number of paths (only the present values of the paths are kept).
+    The models, with the rates in percentage, are:
+        'vasicek': short rate dr = speed*(mean-r)dt + sigma*dW, simulated with its exact transition
+        'cir': short rate dr = speed*(mean-r)dt + sigma*sqrt(r)*dW, simulated with its exact (noncentral chi-square)
+            transition. Note that sigma refers to the rates in percentage. speed and sigma must be positive
+        'lognormal': effective annual rates i, independent in each step, with 1+i lognormal with mean 1+mean and
+            standard deviation sigma
+    The short rates are continuously compounded and each one is applied to its step, of 1/steps_per_year years.
+
+    :param model: 'vasicek', 'cir' or 'lognormal'
+    :param r0: initial rate, in percentage (not used by 'lognormal')
+    :param mean: long term mean of the rates, in percentage
+    :param speed: speed of mean reversion (not used by 'lognormal')
+    :param sigma: volatility, in percentage
+    :param steps_per_year: number of steps of the simulation per year
+    :param chunk_size: number of paths simulated at once
+    '''
+
+    models = ('vasicek', 'cir', 'lognormal')
+
+    def __init__(self, model='vasicek', r0=3., mean=3., speed=.1, sigma=1., steps_per_year=1, chunk_size=10000):
+        if model not in self.models or steps_per_year < 1:
+            return
+        # the exact transition of 'cir' needs a positive speed and volatility
+        if model == 'cir' and (speed <= 0 or sigma <= 0):
+            return
+        self.__model = model
+        self.__r0 = r0
+        self.__mean = mean
+        self.__speed = speed
+        self.__sigma = sigma
+        self.__steps_per_year = int(steps_per_year)
+        self.__chunk_size = chunk_size
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}" \
+               f"{self.model, self.r0, self.mean, self.speed, self.sigma, self.steps_per_year, self.chunk_size}"
+
+    # getters and setters
+    @property
+    def model(self):
+        return self.__model
+
+    @property
+    def r0(self):
+        return self.__r0
+
+    @property
+    def mean(self):
+        return self.__mean
+
+    @property
+    def speed(self):
+        return self.__speed
+
+    @property
+    def sigma(self):
+        return self.__sigma
+
+    @property
+    def steps_per_year(self):
+        return self.__steps_per_year
+
+    @property
+    def chunk_size(self):
+        return self.__chunk_size
+
+    def simulate(self, n_paths, years, rng=None):
+        '''
+        Simulates the rates of n_paths paths.
+
+        :param n_paths: number of paths
+        :param years: number of years of each path
+        :param rng: numpy Generator, or a seed
+        :return: matrix paths x steps with the rate, in percentage, of each step of 1/steps_per_year years
+        '''
+        rng = np.random.default_rng(rng)
+        h = 1 / self.__steps_per_year
+        steps = int(round(years * self.__steps_per_year))
+        rates = np.empty((n_paths, steps))
+        if self.__model == 'lognormal':
+            s2 = np.log(1 + (self.__sigma / (100 + self.__mean)) ** 2)
+            mu = np.log(1 + self.__mean / 100.) - s2 / 2
+            rates[:] = (np.exp(rng.normal(mu, np.sqrt(s2), size=rates.shape)) - 1) * 100
+            return rates
+        decay = np.exp(-self.__speed * h)
+        r = np.full(n_paths, float(self.__r0))
+        if self.__model == 'vasicek':
+            if self.__speed == 0:
+                sd = self.__sigma * np.sqrt(h)
+            else:
+                sd = self.__sigma * np.sqrt((1 - decay ** 2) / (2 * self.__speed))
+            for j in range(steps):
+                rates[:, j] = r
+                r = r * decay + self.__mean * (1 - decay) + sd * rng.standard_normal(n_paths)
+        else:
+            c = self.__sigma ** 2 * (1 - decay) / (4 * self.__speed)
+            df = 4 * self.__speed * self.__mean / self.__sigma ** 2
+            for j in range(steps):
+                rates[:, j] = r
+                r = c * rng.noncentral_chisquare(df, np.maximum(r, 0.) * decay / c)
+        return rates
+
+    def discount_factors(self, n_paths, years, rng=None):
+        '''
+        Simulates the discount factors v(0, k), for the integer times k=0, 1, ..., years, of n_paths paths.
+
+        :param n_paths: number of paths
+        :param years: number of years of each path
+        :param rng: numpy Generator, or a seed
+        :return: matrix paths x (years+1) with the discount factors
+        '''
+        h = 1 / self.__steps_per_year
+        rates = self.simulate(n_paths, years, rng) / 100.
+        if self.__model == 'lognormal':
+            log_discount = -np.log1p(rates) * h
+        else:
+            log_discount = -rates * h
+        log_discount = np.hstack([np.zeros((n_paths, 1)), np.cumsum(log_discount, axis=1)])
+        return np.exp(log_discount[:, ::self.__steps_per_year])
+
+    def present_values(self, cash_flows, n_paths, seed=None):
+        '''
+        Present values of a cash-flow, possibly contingent on probabilities, for each simulated path.
+
+        :param cash_flows: vector with the (expected) cash-flow at each time k=0, 1, ..., K, in years
+        :param n_paths: number of paths
+        :param seed: the seed of the simulation. The same seed and chunk_size give the same paths
+        :return: array with the present value of each path
+        '''
+        cash_flows = np.asarray(cash_flows, dtype=float)
+        years = len(cash_flows) - 1
+        rng = np.random.default_rng(seed)
+        values = np.empty(n_paths)
+        for start in range(0, n_paths, self.__chunk_size):
+            size = min(self.__chunk_size, n_paths - start)
+            values[start:start + size] = self.discount_factors(size, years, rng) @ cash_flows
+        return values
+
+    def annuity_certain(self, n, n_paths=10000, due=False, seed=None, quantiles=(.005, .05, .5, .95, .995)):
+        '''
+        Distribution of the present value of an annuity-certain of 1 per year, for n years.
+
+        :param n: number of years
+        :param n_paths: number of paths
+        :param due: True for payments at the beginning of each year and False at the end
+        :param seed: the seed of the simulation
+        :param quantiles: the probabilities of the quantiles
+        :return: dictionary with the statistics of the present values, see statistics
+        '''
+        cash_flows = np.zeros(n + 1)
+        cash_flows[(0 if due else 1):(n if due else n + 1)] = 1.
+        return statistics(self.present_values(cash_flows, n_paths, seed), quantiles)
+
+    def life_annuity(self, mt, x, n=None, due=False, n_paths=10000, seed=None,
+                     quantiles=(.005, .05, .5, .95, .995)):
+        '''
+        Distribution, over the interest paths, of the expected present value of a life annuity of 1 per year.
+
+        :param mt: MortalityTable (or CommutationFunctions) of the life
+        :param x: age at the beginning of the contract
+        :param n: number of years, or None for a whole life annuity
+        :param due: True for payments at the beginning of each year and False at the end
+        :param n_paths: number of paths
+        :param seed: the seed of the simulation
+        :param quantiles: the probabilities of the quantiles
+        :return: dictionary with the statistics of the present values, see statistics
+        '''
+        # for ages beyond w there are no payments (n=0)
+        n = max(mt.w - x + 1, 0) if n is None else n
+        k = np.arange(n + 1)
+        cash_flows = mt.npx_array(x, k) * ((k < n) if due else (k > 0))
+        return statistics(self.present_values(cash_flows, n_paths, seed), quantiles)
+
+    def life_insurance(self, mt, x, n=None, endowment=False, n_paths=10000, seed=None,
+                       quantiles=(.005, .05, .5, .95, .995)):
+        '''
+        Distribution, over the interest paths, of the expected present value of a life insurance of 1, paid at the
+        end of the year of death.
+
+        :param mt: MortalityTable (or CommutationFunctions) of the life
+        :param x: age at the beginning of the contract
+        :param n: number of years, or None for a whole life insurance
+        :param endowment: True to add a pure endowment of 1 at the end of the n years (endowment insurance)
+        :param n_paths: number of paths
+        :param seed: the seed of the simulation
+        :param quantiles: the probabilities of the quantiles
+        :return: dictionary with the statistics of the present values, see statistics
+        '''
+        # for ages beyond w there are no payments (n=0)
+        n = max(mt.w - x + 1, 0) if n is None else n
+        k = np.arange(n + 1)
+        survival = mt.npx_array(x, k)
+        cash_flows = np.append(0., survival[:-1] - survival[1:])
+        if endowment:
+            cash_flows[-1] += survival[-1]
+        return statistics(self.present_values(cash_flows, n_paths, seed), quantiles)
+
+
+def statistics(values, quantiles=(.005, .05, .5, .95, .995)):
+    '''
+    Statistics of the distribution of simulated values.
+
+    :param values: array of values
+    :param quantiles: the probabilities of the quantiles
+    :return: dictionary with the mean, the standard deviation, the standard error of the mean, the minimum, the
+    maximum and the quantiles {probability: quantile}
+    '''
+    values = np.asarray(values, dtype=float)
+    std = float(np.std(values, ddof=1)) if len(values) > 1 else 0.
+    return {'mean': float(np.mean(values)), 'std': std, 'std_error': std / np.sqrt(max(len(values), 1)),
+            'min': float(np.min(values)), 'max': float(np.max(values)),
+            'quantiles': dict(zip(quantiles, np.quantile(values, quantiles).tolist()))}
@@ -0,0 +1,170 @@
+__author__ = "PedroCR"
+
+import json
+import mmap
+import os
+
+import numpy as np
+from lifeactuary.mortality_table import MortalityTable
+from lifeactuary.commutation_table import CommutationFunctions
+
+# Store file: the magic bytes, the length of the json header, the json header (with one entry for each table: its
+# key, its parameters and the offset and length of each array), padded to a multiple of 8 bytes, followed by the
+# arrays, all float64.
+store_magic = b'LATSTR01'
+_mortality_columns = ('lx', 'px', 'qx', 'dx', 'ex')
+_commutation_columns = ('Dx', 'Nx', 'Sx', 'Cx', 'Mx', 'Rx')
+
+
+def write_table_store(file_name, bases):
+    '''
+    Builds the tables of the bases and writes all their columns to a single store file, to be read with TableStore.
+    The file is written to a temporary file first and then renamed, so that other processes never read a partial
+    store. For instance, to store the SOA tables at several interest rates:
+        write_table_store('tables.store', [{'table_id': soa.table_id, 'mt': soa.table_qx, 'i': i}
+                                           for soa in soa_tables for i in (1, 2, 3)])
+
+    :param file_name: the name of the store file
+    :param bases: iterable of dictionaries with the table_id and the mt of each table and, optionally, its data_type,
+    perc, last_q, i, g and app_cont (as in CommutationFunctions). With i None (the default) only the MortalityTable is
+    stored. A base with the same key as a previous one is not written
+    :return: the number of tables written
+    '''
+    entries = []
+    keys = set()
+    arrays = []
+    offset = 0
+    for base in bases:
+        i = base.get('i')
+        g = base.get('g', 0)
+        perc = base.get('perc', 100)
+        app_cont = base.get('app_cont', False)
+        data_type = base.get('data_type', 'q')
+        last_q = base.get('last_q', 1)
+        key = TableStore.key(base['table_id'], i, g, perc, app_cont, data_type, last_q)
+        if key in keys:
+            continue
+        keys.add(key)
+        if i is None:
+            table = MortalityTable(data_type=data_type, mt=base['mt'], perc=perc, last_q=last_q, msn_mode='off')
+            columns = _mortality_columns
+        else:
+            table = CommutationFunctions(i=i, g=g, data_type=data_type, mt=base['mt'], perc=perc, app_cont=app_cont,
+                                         msn_mode='off', last_q=last_q)
+            columns = _mortality_columns + _commutation_columns
+        entry = {'key': key, 'arrays': {}}
+        for col in ('mt',) + columns:
+            value = np.ascontiguousarray(base['mt'] if col == 'mt' else getattr(table, col), dtype='<f8')
+            entry['arrays'][col] = [offset, len(value)]
+            arrays.append(value)
+            offset += value.nbytes
+        entries.append(entry)
+
+    tmp_file = f"{file_name}.{os.getpid()}.tmp"
+    header = json.dumps({'tables': entries}).encode()
+    header += b' ' * (-len(header) % 8)
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(store_magic)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for value in arrays:
+                f.write(value.tobytes())
+        os.replace(tmp_file, file_name)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return len(entries)
+
+
+class TableStore:
+    '''
+    Read-only tables from a store file, written by write_table_store. The file is memory-mapped and the columns of
+    the tables are arrays on the mapped pages, so all the processes that open the same store share the same memory,
+    and no table is parsed or computed. The tables are MortalityTable (or CommutationFunctions) instances, with
+    msn_mode 'off' and read-only arrays, built once for each process when they are first requested.
+
+    :param file_name: the name of the store file
+    '''
+
+    def __init__(self, file_name):
+        self.__file_name = file_name
+        self.__index = {}
+        self.__tables = {}
+        with open(file_name, 'rb') as f:
+            self.__buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__buffer[:8] != store_magic:
+            return
+        header_size = int.from_bytes(self.__buffer[8:16], 'little')
+        self.__data_offset = 16 + header_size
+        for entry in json.loads(self.__buffer[16:self.__data_offset])['tables']:
+            self.__index[tuple(entry['key'])] = entry
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.file_name!r})"
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __contains__(self, key):
+        return tuple(key) in self.__index
+
+    # getters and setters
+    @property
+    def file_name(self):
+        return self.__file_name
+
+    @property
+    def nbytes(self):
+        return len(self.__buffer)
+
+    @staticmethod
+    def key(table_id, i=None, g=0, perc=100, app_cont=False, data_type='q', last_q=1):
+        '''
+        Key of a table in the store.
+
+        :return: tuple (table_id, i, g, perc, app_cont, data_type, last_q), with i None for a MortalityTable
+        '''
+        return (str(table_id), None if i is None else float(i), float(g), float(perc), bool(app_cont), str(data_type),
+                float(last_q))
+
+    def keys(self):
+        '''
+        :return: list with the keys of the tables in the store
+        '''
+        return list(self.__index)
+
+    def __array(self, offset, length):
+        return np.frombuffer(self.__buffer, dtype='<f8', count=length, offset=self.__data_offset + offset)
+
+    def get(self, table_id, i=None, g=0, perc=100, app_cont=False, data_type='q', last_q=1):
+        '''
+        Returns a table from the store.
+
+        :param table_id: the id of the table, as given to write_table_store
+        :param i: interest rate, in percentage, or None for a MortalityTable
+        :param g: rate of growing (in percentage)
+        :param perc: The percentage of qx used
+        :param app_cont: the continuous approach used
+        :param data_type: the data_type of the mt, as given to write_table_store
+        :param last_q: the value for qw
+        :return: a read-only MortalityTable or CommutationFunctions, or None if the table is not in the store
+        '''
+        key = self.key(table_id, i, g, perc, app_cont, data_type, last_q)
+        table = self.__tables.get(key)
+        if table is not None:
+            return table
+        entry = self.__index.get(key)
+        if entry is None:
+            return None
+        columns = {col: self.__array(offset, length) for col, (offset, length) in entry['arrays'].items()}
+        mt = columns.pop('mt').tolist()
+        mt[0] = int(mt[0])
+        if i is None:
+            table = MortalityTable(data_type=data_type, mt=mt, perc=perc, last_q=last_q, msn_mode='off',
+                                   columns=columns)
+        else:
+            table = CommutationFunctions(i=i, g=g, data_type=data_type, mt=mt, perc=perc, app_cont=app_cont,
+                                         msn_mode='off', columns=columns, last_q=last_q)
+        self.__tables[key] = table
+        return table
@@ -0,0 +1,104 @@
+__author__ = "PedroCR"
+
+import numpy as np
+from lifeactuary.commutation_table import CommutationFunctions
+
+
+def spot_to_forward(spot_rates):
+    '''
+    Converts annual spot rates into annual forward rates.
+
+    :param spot_rates: spot rates, in percentage, for the maturities 1, 2, ..., T years
+    :return: array with the forward rates, in percentage, for the years 1, 2, ..., T, that is, from time k-1 to k
+    '''
+    spot = np.asarray(spot_rates, dtype=float) / 100.
+    t = np.arange(1, len(spot) + 1)
+    accumulation = np.power(1 + spot, t)
+    return (accumulation / np.append(1., accumulation[:-1]) - 1) * 100
+
+
+def forward_to_spot(forward_rates):
+    '''
+    Converts annual forward rates into annual spot rates.
+
+    :param forward_rates: forward rates, in percentage, for the years 1, 2, ..., T, that is, from time k-1 to k
+    :return: array with the spot rates, in percentage, for the maturities 1, 2, ..., T years
+    '''
+    forward = np.asarray(forward_rates, dtype=float) / 100.
+    t = np.arange(1, len(forward) + 1)
+    return (np.power(np.cumprod(1 + forward), 1 / t) - 1) * 100
+
+
+class TermStructureCommutationFunctions(CommutationFunctions):
+    '''
+    Commutation functions discounted with a term structure of interest rates, instead of a flat interest rate.
+    The curve starts at the age defined, that is, the life aged age is valued at time 0 of the curve: Dx=lx*v(0,x-age)
+    and Cx=dx*v(0,x+1-age). The discount factors are computed once, so all the annuities and insurances of
+    CommutationFunctions are computed against the curve, with the same cost as for a flat interest rate.
+    For the age of the curve, the factors are present values at time 0. For an older age x, they are values at time
+    x-age, discounted with the forward rates of the curve from then on, as needed for reserves or deferred benefits.
+    The curve is extended with the first forward rate before age and with the last forward rate after its last year.
+    The continuous approach (app_cont) and the value for ages beyond w use the first forward rate.
+
+    :param rates: interest rates in percentage, spot rates for the maturities 1, 2, ..., T years or forward rates for
+    the years 1, 2, ..., T, according to rate_type
+    :param rate_type: Use 'spot' for spot rates or 'forward' for forward rates
+    :param age: age of the life at time 0 of the curve
+    :param data_type: Use 'l' for lx, 'p' for px and 'q' for qx.
+    :param mt: the mortality table, in array format, according to the data_type defined
+    :param perc: The percentage of qx to use, e.g., use 50 for 50%
+    :param app_cont: Use 'True' for continuous approach or 'False' for death payments at the end of the year
+    :param msn_mode: 'full', 'ring' or 'off', see MortalityTable
+    :param msn_size: maximum number of formulas kept in msn, for msn_mode='ring'
+    '''
+
+    def __init__(self, rates=None, rate_type='spot', age=0, data_type='q', mt=None, perc=100, app_cont=False,
+                 msn_mode='full', msn_size=1000):
+        if rates is None or len(rates) == 0 or rate_type not in ('spot', 'forward'):
+            return
+        self.__rates = np.asarray(rates, dtype=float)
+        self.__rate_type = rate_type
+        self.__age = int(age)
+        if rate_type == 'spot':
+            self.__forward_rates = spot_to_forward(self.__rates)
+        else:
+            self.__forward_rates = self.__rates
+        CommutationFunctions.__init__(self, i=self.__forward_rates[0], g=0, data_type=data_type, mt=mt, perc=perc,
+                                      app_cont=app_cont, msn_mode=msn_mode, msn_size=msn_size)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}" \
+               f"{self.rates.tolist(), self.rate_type, self.age, self.data_type, self.mt, self.perc, self.app_cont}"
+
+    # getters and setters
+    @property
+    def rates(self):
+        return self.__rates
+
+    @property
+    def rate_type(self):
+        return self.__rate_type
+
+    @property
+    def age(self):
+        return self.__age
+
+    @property
+    def forward_rates(self):
+        return self.__forward_rates
+
+    @property
+    def spot_rates(self):
+        return forward_to_spot(self.__forward_rates)
+
+    def discount_factors(self):
+        '''
+        Discount factors from the age of the curve to each age x=0,...,w+1, v(0,x-age), computed with the forward
+        rate of each year of age.
+
+        :return: array with the factors, for ages 0 to w+1
+        '''
+        ages = np.arange(len(self.lx))
+        forward = self.__forward_rates[np.clip(ages[:-1] - self.__age, 0, len(self.__forward_rates) - 1)] / 100.
+        discount = np.cumprod(np.append(1., 1 / (1 + forward)))
+        return discount / discount[min(max(self.__age, 0), len(discount) - 1)]
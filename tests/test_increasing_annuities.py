@@ -0,0 +1,103 @@
+'''
+The increasing annuities and insurances (t_nIax, t_nIaax, nIArx, nIArx_ and their array versions) are obtained from
+Sx/Nx/Dx and Rx/Mx when g=0. They are pinned to the loops over the deferred terms, with the increments deferred from
+age x:
+    t_nIax = first_amount * t_nax(x, n, m, defer) + increase_amount * sum_{j=1}^{n-1} t_nax(x, n-j, m, defer+j)
+    t_nIaax = first_amount * t_naax(x, n, m, defer) + increase_amount * sum_{j=1}^{n-1} t_nax(x, n-j, m, defer+j-1)
+    nIArx = first_amount * t_nAx(x, n, defer) + increase_amount * sum_{j=1}^{n-1} t_nAx(x, n-j, defer+j)
+'''
+
+__author__ = "PedroCR"
+
+import itertools
+import os
+
+import numpy as np
+import pytest
+
+from lifeactuary.commutation_table import CommutationFunctions
+from lifeactuary.read_soa_table_xml import SoaTable
+
+table = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'soa_tables', 'GRF95.xml')
+mt = SoaTable(table).table_qx
+
+ages = (-1, 0, 1, 40, 65, 100, 105, 106, 110, 120, 125, 126)
+terms = (0, 1, 2, 5, 20)
+frequencies = (1, 12)
+deferments = (0, 3)
+amounts = ((1, 1), (10, -.5), (1, -2))
+
+
+def loop(cf, function, x, n, m, defer, first_amount, increase_amount):
+    '''
+    The increasing annuity or insurance from the sum of the deferred terms, with the checks of the scalar functions.
+    With no term (n <= 0) there are no payments.
+    '''
+    if first_amount + (n - 1) * increase_amount < 0:
+        return np.nan
+    if function in ('t_nIax', 't_nIaax') and x + n + defer > cf.w:
+        return 0.
+    if x < 0:
+        return np.nan
+    if n <= 0:
+        return 0.
+    if function == 't_nIax':
+        return first_amount * cf.t_nax(x, n, m, defer) + \
+            increase_amount * sum(cf.t_nax(x, n - j, m, defer + j) for j in range(1, n))
+    if function == 't_nIaax':
+        return first_amount * cf.t_naax(x, n, m, defer) + \
+            increase_amount * sum(cf.t_nax(x, n - j, m, defer + j - 1) for j in range(1, n))
+    insurance = cf.t_nAx if function == 'nIArx' else cf.t_nAx_
+    return first_amount * insurance(x, n, defer) + \
+        increase_amount * sum(insurance(x, n - j, defer + j) for j in range(1, n))
+
+
+@pytest.fixture(scope='module', params=list(itertools.product((0, 2), (False, True))),
+                ids=lambda p: f"g{p[0]}-cont{p[1]}")
+def cf(request):
+    g, app_cont = request.param
+    return CommutationFunctions(i=3, g=g, mt=mt, app_cont=app_cont, msn_mode='off')
+
+
+def cases(functions):
+    for function in functions:
+        m_values = frequencies if function in ('t_nIax', 't_nIaax') else (1,)
+        for x, n, m, defer, (first_amount, increase_amount) in itertools.product(ages, terms, m_values, deferments,
+                                                                                 amounts):
+            yield function, x, n, m, defer, first_amount, increase_amount
+
+
+def kwargs(function, m, defer, first_amount, increase_amount):
+    k = {'defer': defer, 'first_amount': first_amount, 'increase_amount': increase_amount}
+    if function in ('t_nIax', 't_nIaax'):
+        k['m'] = m
+    return k
+
+
+@pytest.mark.parametrize('function', ('t_nIax', 't_nIaax', 'nIArx', 'nIArx_'))
+def test_scalar_against_loop(cf, function):
+    for _, x, n, m, defer, first_amount, increase_amount in cases((function,)):
+        expected = loop(cf, function, x, n, m, defer, first_amount, increase_amount)
+        value = getattr(cf, function)(x, n, **kwargs(function, m, defer, first_amount, increase_amount))
+        assert np.isclose(value, expected, rtol=1e-10, atol=1e-12, equal_nan=True), (x, n, m, defer, first_amount,
+                                                                                   increase_amount, value, expected)
+
+
+@pytest.mark.parametrize('function', ('t_nIax', 't_nIaax', 'nIArx', 'nIArx_'))
+def test_array_against_loop(cf, function):
+    rows = list(cases((function,)))
+    x, n, m, defer, first_amount, increase_amount = (np.array(column) for column in list(zip(*rows))[1:])
+    k = {'defer': defer, 'first_amount': first_amount, 'increase_amount': increase_amount}
+    if function in ('t_nIax', 't_nIaax'):
+        k['m'] = m
+    values = getattr(cf, function + '_array')(x, n, **k)
+    expected = np.array([loop(cf, *row) for row in rows])
+    assert np.allclose(values, expected, rtol=1e-10, atol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize('function, x', (('t_nIaax', 0), ('t_nIax', 106), ('t_nIax', 40), ('t_nIaax', 40)))
+def test_no_term_is_zero(function, x):
+    cf = CommutationFunctions(i=3, mt=mt, msn_mode='off')
+    assert getattr(cf, function)(x, 0, m=12) == 0.
+    assert getattr(cf, function)(x, 0, m=12, defer=3) == 0.
+    assert getattr(cf, function + '_array')(np.array([x]), np.array([0]), m=12)[0] == 0.
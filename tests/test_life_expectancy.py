@@ -0,0 +1,73 @@
+'''
+exn and exn_array are obtained from the reverse cumulative sums of lx times the integral of px. They are pinned to
+the sum, year by year, of tpx times the integral of px (the original loop of exn), at the old ages, where lx is small.
+'''
+
+__author__ = "PedroCR"
+
+import itertools
+import os
+
+import numpy as np
+import pytest
+
+from lifeactuary.mortality_table import MortalityTable
+from lifeactuary.read_soa_table_xml import SoaTable
+
+folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'soa_tables')
+methods = ('udd', 'cfm', 'bal')
+periods = (1, 2.5, 5, 10, 200)
+
+
+def loop(mt, x, n, method):
+    '''
+    exn with the sum, year by year, of the complete years.
+    '''
+    if x < 0:
+        return np.nan
+    if n <= 0:
+        return 1.
+    n_max = mt.w - x + 2 if x + n > mt.w else n
+    next_age = int(x) if x == int(x) else int(x) + 1
+    to_complete_age = np.round(next_age - x, 6)
+    if to_complete_age >= n_max:
+        return n_max * mt.npx(x, n_max / 2, method)
+    integral1 = to_complete_age * mt.npx(x, to_complete_age / 2, method) if to_complete_age > 0 else 0
+    complete_years = int(n_max - to_complete_age)
+    integrals = [mt.npx(x, to_complete_age + t, method) * mt.get_integral_px_method(next_age + t, method)
+                 for t in range(complete_years)]
+    final_period = np.round(n_max - to_complete_age - complete_years, 6)
+    integral2 = 0
+    if final_period > 0:
+        integral2 = mt.npx(x, complete_years, method) * final_period * \
+            mt.npx(next_age + int(n - to_complete_age), final_period, method)
+    return integral1 + sum(integrals) + integral2
+
+
+@pytest.fixture(scope='module', params=('GRM80', 'GRF95', 'TV7377'))
+def mt(request):
+    return MortalityTable(mt=SoaTable(os.path.join(folder, request.param + '.xml')).table_qx, msn_mode='off')
+
+
+def old_ages(mt):
+    return list(range(mt.w - 15, mt.w + 2)) + [mt.w - 10.5, mt.w - 3.25, mt.w + .5]
+
+
+@pytest.mark.parametrize('method', methods)
+def test_exn_against_loop(mt, method):
+    for x, n in itertools.product(old_ages(mt), periods):
+        assert np.isclose(mt.exn(x, n, method), loop(mt, x, n, method), rtol=1e-13, atol=0), (x, n)
+
+
+@pytest.mark.parametrize('method', methods)
+def test_exn_array_against_loop(mt, method):
+    x, n = (np.array(column, dtype=float) for column in zip(*itertools.product(old_ages(mt), periods)))
+    expected = np.array([loop(mt, a, b, method) for a, b in zip(x, n)])
+    assert np.allclose(mt.exn_array(x, n, method), expected, rtol=1e-13, atol=0)
+
+
+def test_exn_last_ages():
+    mt = MortalityTable(mt=SoaTable(os.path.join(folder, 'GRM80.xml')).table_qx, msn_mode='off')
+    assert mt.exn(117, 200) == .5
+    assert np.isclose(mt.exn(115, 200), 1.03687977728, rtol=1e-12, atol=0)
+    assert mt.exn_array(np.array([117]), np.array([200]))[0] == .5
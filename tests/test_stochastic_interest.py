@@ -0,0 +1,47 @@
+'''
+StochasticInterest: without volatility the present values are the deterministic ones of CommutationFunctions, and
+lives beyond the last age of the table have no payments.
+'''
+
+__author__ = "PedroCR"
+
+import os
+
+import numpy as np
+import pytest
+
+from lifeactuary.commutation_table import CommutationFunctions
+from lifeactuary.read_soa_table_xml import SoaTable
+from lifeactuary.stochastic_interest import StochasticInterest
+
+table = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'soa_tables', 'GRF95.xml')
+cf = CommutationFunctions(i=3, mt=SoaTable(table).table_qx, msn_mode='off')
+deterministic = StochasticInterest('lognormal', mean=3., sigma=0.)
+
+
+@pytest.mark.parametrize('x, n', ((40, None), (40, 10), (100, 30)))
+def test_without_volatility(x, n):
+    due = deterministic.life_annuity(cf, x, n, due=True, n_paths=10, seed=0)
+    immediate = deterministic.life_annuity(cf, x, n, n_paths=10, seed=0)
+    insurance = deterministic.life_insurance(cf, x, n, n_paths=10, seed=0)
+    if n is None:
+        expected = cf.aax(x), cf.ax(x), cf.Ax(x)
+    else:
+        expected = cf.naax(x, n), cf.nax(x, n), cf.nAx(x, n)
+    assert np.allclose([due['mean'], immediate['mean'], insurance['mean']], expected, rtol=1e-10)
+    assert due['std'] < 1e-12
+
+
+@pytest.mark.parametrize('x', (cf.w + 1, cf.w + 5, 200))
+def test_ages_beyond_w(x):
+    model = StochasticInterest('vasicek')
+    for statistics in (model.life_annuity(cf, x, n_paths=100, seed=0),
+                       model.life_annuity(cf, x, due=True, n_paths=100, seed=0),
+                       model.life_insurance(cf, x, n_paths=100, seed=0)):
+        assert statistics['mean'] == 0. and statistics['max'] == 0. and statistics['min'] == 0.
+
+
+@pytest.mark.parametrize('speed, sigma', ((0., 1.), (.1, 0.), (-.1, 1.)))
+def test_cir_needs_positive_speed_and_sigma(speed, sigma):
+    model = StochasticInterest('cir', speed=speed, sigma=sigma)
+    assert not hasattr(model, '_StochasticInterest__model')
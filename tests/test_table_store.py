@@ -0,0 +1,50 @@
+'''
+TableStore: the tables of a table_id are told apart by all the parameters that build them, including the data_type
+and last_q of the mt, and a base with the key of a previous one is not written.
+'''
+
+__author__ = "PedroCR"
+
+import os
+
+import numpy as np
+import pytest
+
+from lifeactuary.commutation_table import CommutationFunctions
+from lifeactuary.mortality_table import MortalityTable
+from lifeactuary.read_soa_table_xml import SoaTable
+from lifeactuary.table_store import TableStore, write_table_store
+
+soa = SoaTable(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'soa_tables', 'GRF95.xml'))
+mt_q = soa.table_qx
+mt_p = [mt_q[0]] + [1 - q for q in mt_q[1:]]
+bases = [{'table_id': 'GRF95', 'mt': mt_q}, {'table_id': 'GRF95', 'mt': mt_p, 'data_type': 'p', 'perc': 80},
+         {'table_id': 'GRF95', 'mt': mt_q, 'i': 2}, {'table_id': 'GRF95', 'mt': mt_p, 'data_type': 'p', 'i': 2},
+         {'table_id': 'GRF95', 'mt': mt_q, 'last_q': 0, 'i': 2}]
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    file_name = str(tmp_path_factory.mktemp('store') / 'tables.store')
+    # the last base has the key of the third, so it is not written
+    assert write_table_store(file_name, bases + [{'table_id': 'GRF95', 'mt': mt_q[:10], 'i': 2}]) == len(bases)
+    return TableStore(file_name)
+
+
+def test_keys(store):
+    assert len(store) == len(bases)
+    assert ('GRF95', 2., 0., 100., False, 'p', 1.) in store
+
+
+@pytest.mark.parametrize('base', bases)
+def test_tables(store, base):
+    data_type, last_q, perc, i = base.get('data_type', 'q'), base.get('last_q', 1), base.get('perc', 100), base.get('i')
+    table = store.get('GRF95', i, perc=perc, data_type=data_type, last_q=last_q)
+    if i is None:
+        expected = MortalityTable(data_type=data_type, mt=base['mt'], perc=perc, last_q=last_q, msn_mode='off')
+    else:
+        expected = CommutationFunctions(i=i, data_type=data_type, mt=base['mt'], perc=perc, msn_mode='off',
+                                        last_q=last_q)
+        assert np.array_equal(table.Nx, expected.Nx)
+    assert table.w == expected.w
+    assert np.array_equal(table.qx, expected.qx) and np.array_equal(table.lx, expected.lx)